@@ -0,0 +1,307 @@
+"""
+Python 部分的性能测试, 不需要仿真器
+
+    python benchmarks/bench.py                          # 运行并打印结果
+    python benchmarks/bench.py --save baseline.json     # 保存为基准
+    python benchmarks/bench.py --compare baseline.json  # 与基准比较, 退步时返回 1
+
+每项测试记录耗时、吞吐量 (每秒处理的值的个数) 和 Python 内存峰值 (tracemalloc)。
+每次计时之前清空值的驻留池, 使转换不会变成驻留池的查找
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from pathlib import Path
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vunit_py import Test, Value  # noqa: E402
+from vunit_py.event_clock import EventClock  # noqa: E402
+from vunit_py.port import Port, PortType  # noqa: E402
+
+# 一项测试: (名称, 处理的值的个数, 准备函数), 准备函数返回需要计时的函数
+Case = Tuple[str, int, Callable[[], Callable[[], Any]]]
+
+
+def _randomInts(width: int, n: int, seed: int = 0) -> List[int]:
+    rng = random.Random(seed)
+    return [rng.getrandbits(width) for _ in range(n)]
+
+
+def _randomStrs(width: int, n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return ["".join(rng.choices("01xz", [8, 8, 1, 1], k=width)) for _ in range(n)]
+
+
+def _port(width: int) -> Port:
+
+    class Parent(object):
+
+        def hasClock(self, clk: str) -> bool:
+            return True
+
+    return Port(PortType.IN, width, False, Parent())
+
+
+def _valueCases(width: int, n: int) -> Iterator[Case]:
+    suffix = "[w={},n={}]".format(width, n)
+
+    def fromInt() -> Callable[[], Any]:
+        ints = _randomInts(width, n)
+        return lambda: [Value.fromInt(v, width, False) for v in ints]
+
+    def fromStr() -> Callable[[], Any]:
+        strs = _randomStrs(width, n)
+        return lambda: [Value.fromStr(s, width, False) for s in strs]
+
+    def fromBytes() -> Callable[[], Any]:
+        w = -(-width // 8) * 8
+        bs = [v.to_bytes(w // 8, "big") for v in _randomInts(w, n)]
+        return lambda: [Value.fromBytes(b, w, False) for b in bs]
+
+    def toInt() -> Callable[[], Any]:
+        values = [Value.fromInt(v, width, False) for v in _randomInts(width, n)]
+        return lambda: [int(v) for v in values]
+
+    yield "value.fromInt" + suffix, n, fromInt
+    yield "value.fromStr" + suffix, n, fromStr
+    yield "value.fromBytes" + suffix, n, fromBytes
+    yield "value.__int__" + suffix, n, toInt
+
+
+def _portCases(width: int, n: int) -> Iterator[Case]:
+    suffix = "[w={},n={}]".format(width, n)
+
+    def normalizeList() -> Callable[[], Any]:
+        ints = _randomInts(width, n)
+        port = _port(width)
+        return lambda: port.normalize(ints)
+
+    def normalizeDict() -> Callable[[], Any]:
+        # 每 16 个事件变化一次
+        d = {t: v for t, v in zip(range(0, n, 16), _randomInts(width, n))}
+        port = _port(width)
+        return lambda: port.normalize(d)
+
+    def normalizeBytes() -> Callable[[], Any]:
+        w = -(-width // 8) * 8
+        b = random.Random(0).getrandbits(w * n).to_bytes(w * n // 8, "big")
+        port = _port(w)
+        return lambda: list(port.normalize(b))
+
+    yield "port.normalize.list" + suffix, n, normalizeList
+    yield "port.normalize.dict" + suffix, n, normalizeDict
+    yield "port.normalize.bytes" + suffix, n, normalizeBytes
+
+
+def _serialCases(n: int) -> Iterator[Case]:
+
+    def normalizeSerial() -> Callable[[], Any]:
+        # 1 位端口的串行数据, 每个字节包含 8 个值
+        m = -(-n // 8)
+        b = random.Random(0).getrandbits(m * 8).to_bytes(m, "big")
+        port = _port(1)
+        return lambda: list(port.normalize(b))
+
+    yield "port.normalize.serial[n={}]".format(n), -(-n // 8) * 8, \
+        normalizeSerial
+
+
+def _clockCases(n: int) -> Iterator[Case]:
+
+    def getitem() -> Callable[[], Any]:
+        clock = EventClock([2, 3, 5], 7)
+        return lambda: [clock[t] for t in range(n)]
+
+    yield "eventclock.__getitem__[n={}]".format(n), n, getitem
+
+
+def _testCases(width: int, n: int, ports: int, tmp: Path) -> Iterator[Case]:
+    suffix = "[w={},n={},p={}]".format(width, n, ports)
+    path = tmp / "w{}_n{}_p{}".format(width, n, ports)
+    path.mkdir(parents=True, exist_ok=True)
+
+    def make() -> Test:
+        t = Test("dut",
+                 "bench", path,
+                 [("i{}".format(k), width) for k in range(ports)],
+                 [("o{}".format(k), width) for k in range(ports)],
+                 hex_data=True)
+        t.addEventClock("c", 2)
+        for k in range(ports):
+            values = _randomInts(width, n, k)
+            t["i{}".format(k)]**"c" << values
+            t["o{}".format(k)]**"c" >> values
+        return t
+
+    def generate() -> Callable[[], Any]:
+        t = make()
+
+        def run() -> None:
+            t._Test__gen()
+            t._Test__dump()
+            t._Test__write()
+
+        return run
+
+    def check() -> Callable[[], Any]:
+        t = make()
+        t._Test__gen()
+        columns = [t["o{}".format(k)].output.strings() for k in range(ports)]
+        with open(path / "tb_dut_bench_c.out", "w") as f:
+            for row in zip(*columns):
+                f.write("".join(row) + "\n")
+
+        def run() -> None:
+            assert t._Test__check(), "输出不匹配"
+
+        return run
+
+    yield "test.generate" + suffix, n * ports, generate
+    yield "test.check" + suffix, n * ports, check
+
+
+def _dumpCases(width: int, n: int, clocks: int, jobs: int,
+               tmp: Path) -> Iterator[Case]:
+    suffix = "[w={},n={},c={},j={}]".format(width, n, clocks, jobs)
+    path = tmp / "w{}_n{}_c{}_j{}".format(width, n, clocks, jobs)
+    path.mkdir(parents=True, exist_ok=True)
+
+    def dump() -> Callable[[], Any]:
+        t = Test("dut",
+                 "dump", path,
+                 [("i{}".format(k), width) for k in range(clocks)],
+                 [("o", 1)],
+                 dump_jobs=jobs)
+        for k in range(clocks):
+            t.addEventClock("c{}".format(k), 2)
+            t["i{}".format(k)]**"c{}".format(k) << _randomInts(width, n, k)
+        t.addEventClock("o", 2)
+        t["o"]**"o" >> [0]
+        t._Test__gen()
+        return lambda: t._Test__dump()
+
+    # 每个事件时钟的输入数据文件由一个进程生成, 比较 dump_jobs 不同时的吞吐量
+    yield "test.dump" + suffix, n * clocks, dump
+
+
+def measure(setup: Callable[[], Callable[[], Any]], repeat: int,
+            memory: bool) -> Dict[str, float]:
+    """
+    取 repeat 次中最短的耗时, memory 为真时再运行一次记录内存峰值。
+    每次运行之前清空驻留池, 否则之后的运行只是查找之前生成的值
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        f = setup()
+        Value.clearCache()
+        gc.collect()
+        start = time.perf_counter()
+        f()
+        seconds = min(seconds, time.perf_counter() - start)
+        del f
+    res = {"seconds": seconds}
+    if memory:
+        f = setup()
+        Value.clearCache()
+        gc.collect()
+        tracemalloc.start()
+        f()
+        res["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return res
+
+
+def compare(results: Dict[str, Dict[str, float]],
+            baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """
+    返回吞吐量低于基准或内存峰值高于基准超过 threshold 比例的测试
+    """
+    regressions = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if b is None:
+            continue
+        if r["throughput"] < b["throughput"] * (1 - threshold):
+            regressions.append("{}: 吞吐量 {:.3g}/s < 基准 {:.3g}/s".format(
+                name, r["throughput"], b["throughput"]))
+        if "peak_bytes" in r and "peak_bytes" in b and \
+                r["peak_bytes"] > b["peak_bytes"] * (1 + threshold):
+            regressions.append("{}: 内存峰值 {} > 基准 {}".format(
+                name, r["peak_bytes"], b["peak_bytes"]))
+    return regressions
+
+
+def _ints(text: str) -> List[int]:
+    return [int(float(s)) for s in text.split(",") if s]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="vunit_py 性能测试")
+    parser.add_argument("--widths", type=_ints, default=[1, 8, 64, 256, 1024],
+                        help="端口宽度, 以逗号分隔")
+    parser.add_argument("--lengths", type=_ints, default=[1000, 100000],
+                        help="序列长度, 以逗号分隔, 可以写成 1e7")
+    parser.add_argument("--ports", type=_ints, default=[1, 8],
+                        help="生成和检查测试时的输入/输出端口数, 以逗号分隔")
+    parser.add_argument("--dump-jobs", type=_ints, default=[1, 4],
+                        help="生成测试数据的进程数 (dump_jobs), 以逗号分隔")
+    parser.add_argument("--filter", default="", help="只运行名称包含此字符串的测试")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测试的重复次数")
+    parser.add_argument("--no-memory", action="store_true", help="不记录内存峰值")
+    parser.add_argument("--save", type=Path, help="将结果保存为基准")
+    parser.add_argument("--compare", type=Path, help="与基准比较")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="判定为退步的比例")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cases: List[Case] = []
+        for n in args.lengths:
+            for w in args.widths:
+                cases.extend(_valueCases(w, n))
+                cases.extend(_portCases(w, n))
+                for p in args.ports:
+                    cases.extend(_testCases(w, n, p, Path(tmp)))
+                for j in args.dump_jobs:
+                    cases.extend(_dumpCases(w, n, 4, j, Path(tmp)))
+            cases.extend(_serialCases(n))
+            cases.extend(_clockCases(n))
+
+        results: Dict[str, Dict[str, float]] = {}
+        for name, items, setup in cases:
+            if args.filter not in name:
+                continue
+            r = measure(setup, args.repeat, not args.no_memory)
+            r["throughput"] = items / r["seconds"] if r["seconds"] else 0.0
+            results[name] = r
+            print("{:<48} {:>10.4f} s {:>14.3g}/s {:>12}".format(
+                name, r["seconds"], r["throughput"],
+                r.get("peak_bytes", "-")))
+            sys.stdout.flush()
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print("退步：" + r)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,15 +13,11 @@ t1 = Test(
     # 不用的端口可以不写
     in_ports=["clk", "a", "b"],
     out_ports=[("sum", 2)])
-# 最简单的事件时钟，每个时刻都会发生事件
-t1.addEventClock("ec_clk", 1)
-# 最简单的时钟设置，注意次数不要太多，否则会生成一个巨大的寄存器数组
-# 事件对应如下：
+# 最简单的时钟设置，周期为 2，生成为测试文件中的循环，不会生成寄存器数组
+# 信号对应如下：
 # 时间 #0 #1 #2 #3 #4 #5 #6
-# 次数     0  1  2  3  4  5
 # 信号  0  1  0  1  0  1  0
-#      ^初始值
-t1["clk"]**"ec_clk" // 0 << [1, 0] * 100
+t1.addClockPort("clk", 2)
 # 在 clk 下降沿的时候写入和读取数据
 t1.addEventClock("ec", 2)
 # 事件对应如下：
@@ -52,8 +48,7 @@ t2 = Test("adder",
           os.path.join(TESTS, "__autogen__"),
           in_ports=["clk", "a", "b", "rst"],
           out_ports=[("sum", 2)])
-t2.addEventClock("ec_clk", 5)
-t2["clk"]**"ec_clk" // 0 << [1, 0] * 100
+t2.addClockPort("clk", 10)
 # 精细控制 rst 时机
 # 时间  #0  #5 #10 #15 #20 #25 #30 #35 #40
 # clk   0   1   0   1   0   1   0   1   0
@@ -17,8 +17,7 @@ sh.output(6, {"sum": 0}).output(16, {"sum": 1})
 sh.input(21, {"a": 1, "b": 0}).input(31, {"b": 1})
 sh.output(26, {"sum": 1}).output(36, {"sum": 2})
 sh.attach()
-t1.addEventClock("ec_clk", 5)
-t1["clk"]**"ec_clk" // 0 << [1, 0] * 10
+t1.addClockPort("clk", 10, until=100)
 
 t2 = Test("adder",
           "cycle_test",
@@ -32,7 +31,6 @@ ch.input("b", 0, [0, 1]).input("b", 2, [1, 0])
 ch.output("sum", 0, [0, 1]).output("sum", 1, [1, 2]).output("sum", 2, [2, 0])
 ch.fillOutput("sum", 2)
 ch.attach()
-t2.addEventClock("ec_clk", 5)
-t2["clk"]**"ec_clk" // 0 << [1, 0] * 10
+t2.addClockPort("clk", 10, until=100)
 
 Test.run([t1, t2], dependencies=[os.path.join(EXAMPLE, "adder.sv")])
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from vunit_py.parallel import runAll
+
+
+def test_run_all_order():
+    tasks = [lambda i=i: (i, os.getpid()) for i in range(6)]
+    res = runAll([str(i) for i in range(6)], tasks, 3)
+    assert [i for i, _ in res] == list(range(6))
+    if hasattr(os, "fork"):
+        assert os.getpid() not in [p for _, p in res]
+
+
+def test_run_all_sequential():
+    res = runAll(["a"], [os.getpid], 4)
+    assert res == [os.getpid()]
+
+
+def test_run_all_errors():
+
+    def bad():
+        raise ValueError("坏任务")
+
+    with pytest.raises(AssertionError) as e:
+        runAll(["ok", "bad"], [lambda: 1, bad], 2)
+    assert "1 个任务出错" in str(e.value)
+    assert "bad:" in str(e.value) and "坏任务" in str(e.value)
@@ -0,0 +1,366 @@
+import json
+
+import pytest
+
+import vunit_py
+from vunit_py import Lazy
+
+
+def _lazyTest(path, **kw):
+    t = vunit_py.Test("adder", "lazy", path, [("a", 4), ("b", 4)], [("s", 4)], **kw)
+    t.addEventClock("c", 2)
+    t["a"]**"c" << Lazy(iter([1, 1, 2, 2, 3] * 4), 20)
+    t["b"]**"c" << [0] * 20
+    t["s"]**"c" >> [1] * 20
+    return t
+
+
+def test_estimate_then_generate_iterator_lazy(tmp_path):
+    for changesOnly in (False, True):
+        t = _lazyTest(tmp_path, changes_only=changesOnly)
+        e = t.estimate()
+        assert e["clocks"]["c"]["events"] == 20
+        assert e["clocks"]["c"]["exact"] != changesOnly
+        t._Test__gen()
+        t._Test__dump()
+        t._Test__write()
+        rows = (tmp_path / "tb_adder_lazy_c.in").read_text().splitlines()
+        assert len(rows) == (12 if changesOnly else 20)
+        # 以事件数作为行数的上限
+        assert e["clocks"]["c"]["files"]["_c.in"] >= \
+            (tmp_path / "tb_adder_lazy_c.in").stat().st_size
+
+
+def _generate(t):
+    t._Test__gen()
+    t._Test__dump()
+    t._Test__write()
+
+
+def _selfCheckTest(path, **kw):
+    t = vunit_py.Test("adder", "sc", path, [("a", 4)], [("s", 4), ("y", 2)],
+                      self_check=True, **kw)
+    t.addEventClock("c1", 2)
+    t.addEventClock("c2", 3)
+    t["a"]**"c1" << list(range(10))
+    t["s"]**"c1" >> list(range(10))
+    t["y"]**"c2" >> [1, 2, 3, 0]
+    return t
+
+
+def test_self_check_fail_fast_reports_mismatch(tmp_path, capsys):
+    t = _selfCheckTest(tmp_path)
+    _generate(t)
+    assert (tmp_path / "tb_adder_sc_c1.exp").exists()
+    # c2 在第 2 个事件不匹配, 结束仿真, c1 只运行了 3 个事件
+    (tmp_path / "tb_adder_sc_c1.mis").write_text("done 3\n")
+    (tmp_path / "tb_adder_sc_c2.mis").write_text("2 01\ndone 3\n")
+    assert not t._Test__check()
+    out = capsys.readouterr().out
+    assert "y @" in out and "2'b11" in out and "2'b01" in out
+
+
+def test_self_check_early_termination(tmp_path):
+    t = _selfCheckTest(tmp_path)
+    _generate(t)
+    (tmp_path / "tb_adder_sc_c1.mis").write_text("done 3\n")
+    (tmp_path / "tb_adder_sc_c2.mis").write_text("done 4\n")
+    with pytest.raises(AssertionError, match="仿真提前结束"):
+        t._Test__check()
+    (tmp_path / "tb_adder_sc_c1.mis").write_text("done 10\n")
+    assert t._Test__check()
+
+
+def test_self_check_report_all_errors(tmp_path):
+    t = _selfCheckTest(tmp_path, report_all_errors=True)
+    _generate(t)
+    assert "AUTOGEN_TEST_DONE <= 1'b1" not in \
+        (tmp_path / "tb_adder_sc.sv").read_text()
+    (tmp_path / "tb_adder_sc_c1.mis").write_text("done 3\n")
+    (tmp_path / "tb_adder_sc_c2.mis").write_text("2 01\ndone 4\n")
+    # 报告所有错误时不会提前结束, 事件数不足说明仿真出错
+    with pytest.raises(AssertionError, match="仿真提前结束"):
+        t._Test__check()
+
+
+def _adder(path, name, params={}, **kw):
+    t = vunit_py.Test("adder", name, path, [("a", 4)], [("s", 4)],
+                      parameters=params, **kw)
+    t.addEventClock("c", 2)
+    t["a"]**"c" << [1, 2, 3]
+    t["s"]**"c" >> [1, 2, 3]
+    return t
+
+
+def _list(path, monkeypatch, capsys, tests, *args, **kw):
+    """
+    以 --list 运行 VUnit, 返回注册的测试名
+    """
+    dep = path / "adder.sv"
+    dep.write_text("module adder #(parameter W = 1) "
+                   "(input [3:0] a, output [3:0] s); assign s = a; endmodule\n")
+    monkeypatch.setattr(
+        "sys.argv", ["run.py", "--list", "-o",
+                     str(path / "vunit_out")] + list(args))
+    with pytest.raises(SystemExit):
+        vunit_py.Test.run(tests, [dep], **kw)
+    out = capsys.readouterr().out
+    return [line for line in out.splitlines() if line.startswith("lib.")]
+
+
+def test_group_tests(tmp_path, monkeypatch, capsys):
+    tests = [_adder(tmp_path, "t"), _adder(tmp_path, "u")]
+    names = _list(tmp_path, monkeypatch, capsys, tests, group_tests=True)
+    assert names == ["lib.tb_adder.t", "lib.tb_adder.u"]
+    sv = (tmp_path / "tb_adder.sv").read_text()
+    assert "module tb_adder;" in sv
+    assert '`TEST_CASE("t")' in sv and '`TEST_CASE("u")' in sv
+    assert "run_all_in_same_sim" not in sv
+    # 每个测试的数据文件各自生成
+    assert (tmp_path / "tb_adder_t_c.in").exists()
+    assert (tmp_path / "tb_adder_u_c.in").exists()
+
+
+def test_group_tests_same_sim(tmp_path, monkeypatch, capsys):
+    tests = [_adder(tmp_path, "t"), _adder(tmp_path, "u")]
+    names = _list(tmp_path, monkeypatch, capsys, tests, group_tests=True,
+                  same_sim=True)
+    assert names == ["lib.tb_adder.t", "lib.tb_adder.u"]
+    assert "// vunit: run_all_in_same_sim" in \
+        (tmp_path / "tb_adder.sv").read_text()
+
+
+def test_parameter_generics(tmp_path, monkeypatch, capsys):
+    tests = [
+        _adder(tmp_path, "t", {"W": 1}),
+        _adder(tmp_path, "u", {"W": 2}),
+        _adder(tmp_path, "v", {"W": 2})
+    ]
+    names = _list(tmp_path, monkeypatch, capsys, tests, group_tests=True,
+                  parameter_generics=True)
+    assert sorted(names) == [
+        "lib.tb_adder.W=1.t", "lib.tb_adder.W=2.u", "lib.tb_adder.W=2.v"
+    ]
+    sv = (tmp_path / "tb_adder.sv").read_text()
+    assert "parameter AUTOGEN_CONFIG = 0;" in sv
+    assert "if (AUTOGEN_CONFIG == 0) begin : AUTOGEN_t" in sv
+    assert "if (AUTOGEN_CONFIG == 1) begin : AUTOGEN_u" in sv
+
+
+def test_parameter_generics_same_sim(tmp_path, monkeypatch, capsys):
+    tests = [_adder(tmp_path, "t", {"W": 1}), _adder(tmp_path, "u", {"W": 2})]
+    names = _list(tmp_path, monkeypatch, capsys, tests, group_tests=True,
+                  parameter_generics=True, same_sim=True)
+    # 每个测试只在其参数组合对应的配置中运行
+    assert sorted(names) == ["lib.tb_adder.W=1.t", "lib.tb_adder.W=2.u"]
+    assert "run_all_in_same_sim" not in \
+        (tmp_path / "tb_adder.sv").read_text()
+    # 只有一种参数组合时仍在同一次仿真中运行
+    tests = [_adder(tmp_path, "t", {"W": 1}), _adder(tmp_path, "u", {"W": 1})]
+    names = _list(tmp_path, monkeypatch, capsys, tests, group_tests=True,
+                  parameter_generics=True, same_sim=True)
+    assert sorted(names) == ["lib.tb_adder.W=1.t", "lib.tb_adder.W=1.u"]
+    assert "// vunit: run_all_in_same_sim" in \
+        (tmp_path / "tb_adder.sv").read_text()
+
+
+def test_run_jobs(tmp_path, monkeypatch, capsys):
+    # 在子进程中生成的文件和状态与在当前进程中生成的相同
+    outputs = {}
+    for jobs in (1, 2):
+        path = tmp_path / str(jobs)
+        path.mkdir()
+        tests = [_adder(path, "t"), _selfCheckTest(path)]
+        tests[1]["y"] >> ["zz"]
+        names = _list(path, monkeypatch, capsys, tests, jobs=jobs)
+        assert names == ["lib.tb_adder_t.t", "lib.tb_adder_sc.sc"]
+        assert tests[1]._Test__zExpected == {"c2"}
+        outputs[jobs] = {
+            f.name: f.read_text().replace(str(path), "")
+            for f in path.iterdir()
+            if f.name.startswith("tb_") and f.suffix != ".json"
+        }
+    assert outputs[1] == outputs[2]
+
+
+def _evaluateTest(path, n):
+    t = vunit_py.Test("adder", "eval", path, [("a", 4)], [("s", 4)])
+    t.addEventClock("c", 2)
+    t["a"]**"c" << [i % 16 for i in range(n)]
+    t["s"]**"c"
+    return t
+
+
+def _outputs(t):
+    return [int(v) for v in t["s"].output]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_evaluate(tmp_path, jobs):
+    t = _evaluateTest(tmp_path, 10)
+    t["s"] >> [7]
+    t.evaluate(lambda ins: {"s": [(int(v) + 1) % 16 for v in ins["a"]]},
+               ["a"], ["s"], chunk_size=3, jobs=jobs)
+    # 模型输出按段的顺序添加到已有输出的末尾
+    assert _outputs(t) == [7] + [(i + 1) % 16 for i in range(10)]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_evaluate_history(tmp_path, jobs):
+    # 相邻两个输入之和, 每段需要上一段末尾的一个输入
+    def model(ins):
+        a = [int(v) for v in ins["a"]]
+        return {"s": [(x + y) % 16 for x, y in zip([0] + a, a)]}
+
+    t = _evaluateTest(tmp_path, 10)
+    t.evaluate(model, ["a"], ["s"], chunk_size=3, jobs=jobs, history=1)
+    a = [i % 16 for i in range(10)]
+    assert _outputs(t) == [(x + y) % 16 for x, y in zip([0] + a, a)]
+
+
+def test_evaluate_state(tmp_path):
+    # 累加器, 状态在各段之间传递
+    def model(ins, acc):
+        out = []
+        for v in ins["a"]:
+            acc = (acc + int(v)) % 16
+            out.append(acc)
+        return {"s": out}, acc
+
+    t = _evaluateTest(tmp_path, 10)
+    t.evaluate(model, ["a"], ["s"], chunk_size=4, jobs=2, state=0)
+    expected, acc = [], 0
+    for i in range(10):
+        acc = (acc + i) % 16
+        expected.append(acc)
+    assert _outputs(t) == expected
+
+
+def test_evaluate_arrays(tmp_path):
+    numpy = pytest.importorskip("numpy")
+
+    def model(ins):
+        assert isinstance(ins["a"], numpy.ndarray)
+        return {"s": [int(x) for x in (ins["a"] * 2) % 16]}
+
+    t = _evaluateTest(tmp_path, 10)
+    t.evaluate(model, ["a"], ["s"], chunk_size=4, arrays=True)
+    assert _outputs(t) == [(i * 2) % 16 for i in range(10)]
+
+
+def test_evaluate_output_length(tmp_path):
+    t = _evaluateTest(tmp_path, 10)
+    with pytest.raises(AssertionError, match="长度不一致"):
+        t.evaluate(lambda ins: {"s": [0]}, ["a"], ["s"], chunk_size=3)
+
+
+def _shardTest(path):
+    # co 上的输出在第一个分片之内结束
+    t = vunit_py.Test("adder", "sh", path, [("a", 4)], [("s", 4), ("y", 2)])
+    t.addEventClock("ci", 2)
+    t.addEventClock("co", 2)
+    t["a"]**"ci" << [i % 16 for i in range(64)]
+    t["s"]**"ci" >> [i % 16 for i in range(64)]
+    t["y"]**"co" >> [i % 4 for i in range(10)]
+    t.shard(4, prologue=4, warmup=8)
+    return t
+
+
+def test_shard_unequal_clocks(tmp_path):
+    shards = _shardTest(tmp_path)._Test__shardTests()
+    assert len(shards) == 4
+    for s in shards:
+        _generate(s)
+    assert sorted(shards[0]._Test__clocks) == ["ci", "co"]
+    # 没有端口依附的事件时钟不加入分片
+    for s in shards[1:]:
+        assert sorted(s._Test__clocks) == ["ci"]
+        assert "AUTOGEN_co_cnt" not in \
+            (tmp_path / "tb_adder_{}.sv".format(s._Test__testName)).read_text()
+    # 各分片检查的输出覆盖原测试的全部输出
+    checked = 0
+    for s in shards:
+        outs = s["s"].output.strings()
+        checked += sum([o != "xxxx" for o in outs])
+    assert checked == 64
+
+
+def test_shard_event_shift(tmp_path, capsys):
+    s = _shardTest(tmp_path)._Test__shardTests()[1]
+    _generate(s)
+    shift = s._Test__eventShift["ci"]
+    assert shift > 0
+    rows = [o.replace("x", "0") for o in s["s"].output.strings()]
+    last = len(rows) - 1
+    rows[last] = "1111" if rows[last] != "1111" else "0000"
+    (tmp_path / "tb_adder_sh_shard1_ci.out").write_text("\n".join(rows) + "\n")
+    assert not s._Test__check()
+    # 不匹配的输出按原测试中的序号报告
+    assert "({}x)".format(last + shift) in capsys.readouterr().out
+
+
+def _passAll(monkeypatch):
+    """
+    记录结果缓存包装的检查函数, 返回后调用其中的函数使测试文件通过
+    """
+    wrapped = []
+    wrap = vunit_py.result_cache.ResultCache.wrap
+
+    def spy(self, key, name, check):
+        f = wrap(self, key, name, lambda: True)
+        wrapped.append(f)
+        return f
+
+    monkeypatch.setattr(vunit_py.result_cache.ResultCache, "wrap", spy)
+    return wrapped
+
+
+def test_result_cache(tmp_path, monkeypatch, capsys):
+    cache = tmp_path / "cache"
+    tests = [_adder(tmp_path, "t"), _adder(tmp_path, "u")]
+    wrapped = _passAll(monkeypatch)
+    names = _list(tmp_path, monkeypatch, capsys, tests, result_cache=cache)
+    assert names == ["lib.tb_adder_t.t", "lib.tb_adder_u.u"]
+    wrapped[0]()
+    # 命中的测试文件不加入 VUnit, 直接报告通过
+    tests = [_adder(tmp_path, "t"), _adder(tmp_path, "u")]
+    dep = tmp_path / "adder.sv"
+    monkeypatch.setattr("sys.argv", ["run.py", "--list", "-o",
+                                     str(tmp_path / "vunit_out")])
+    with pytest.raises(SystemExit):
+        vunit_py.Test.run(tests, [dep], result_cache=cache)
+    out = capsys.readouterr().out
+    assert "lib.tb_adder_t.t 已通过 (缓存)" in out
+    assert "lib.tb_adder_u.u\n" in out and "lib.tb_adder_t.t\n" not in out
+    assert not (tmp_path / "tb_adder_t.cached.sv").exists()
+    # 期望输出改变时不命中
+    tests = [_adder(tmp_path, "t"), _adder(tmp_path, "u")]
+    tests[0]["s"] >> [4]
+    names = _list(tmp_path, monkeypatch, capsys, tests, result_cache=cache)
+    assert names == ["lib.tb_adder_t.t", "lib.tb_adder_u.u"]
+    names = _list(tmp_path, monkeypatch, capsys,
+                  [_adder(tmp_path, "t"), _adder(tmp_path, "u")],
+                  "--no-result-cache", result_cache=cache)
+    assert names == ["lib.tb_adder_t.t", "lib.tb_adder_u.u"]
+
+
+def test_result_cache_all_hit(tmp_path, monkeypatch, capsys):
+    cache = tmp_path / "cache"
+    wrapped = _passAll(monkeypatch)
+    tests = [_adder(tmp_path, "t"), _adder(tmp_path, "u")]
+    _list(tmp_path, monkeypatch, capsys, tests, group_tests=True,
+          result_cache=cache)
+    for f in wrapped:
+        f()
+    # 所有测试都已通过时不运行 VUnit
+    tests = [_adder(tmp_path, "t"), _adder(tmp_path, "u")]
+    with pytest.raises(SystemExit) as e:
+        vunit_py.Test.run(tests, [tmp_path / "adder.sv"], group_tests=True,
+                          result_cache=cache, profile=tmp_path / "profile")
+    assert e.value.code == 0
+    out = capsys.readouterr().out
+    assert "lib.tb_adder.t 已通过 (缓存)" in out
+    assert "lib.tb_adder.u 已通过 (缓存)" in out
+    assert "Listed" not in out
+    summary = json.loads((tmp_path / "profile" / "summary.json").read_text())
+    assert summary["tests"]["lib.tb_adder.t"]["simulate"]["status"] == "cached"
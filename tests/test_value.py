@@ -0,0 +1,33 @@
+import pytest
+
+from vunit_py import Value
+
+numpy = pytest.importorskip("numpy")
+
+
+def test_from_int_numpy_scalar():
+    Value.clearCache()
+    v = Value.fromInt(numpy.int64(-1), 8, True)
+    assert int(v) == -1
+    assert type(v.valuePlane) is int
+    assert int(Value.fromInt(numpy.uint8(200), 8, False)) == 200
+    # 驻留池中不能留下 NumPy 类型的平面
+    q = Value.fromInt(numpy.int64(5), 8, False)
+    p = Value.fromInt(5, 8, False)
+    assert p is q
+    assert type(int(p)) is int
+    assert int(Value.fromInt(numpy.uint64((1 << 64) - 1), 100, False)) == \
+        (1 << 64) - 1
+
+
+def test_intern_narrow_only():
+    Value.clearCache()
+    assert Value.fromInt(3, 8, False) is Value.fromInt(3, 8, False)
+    assert Value.fromStr("01x1", 4, False) is Value.fromStr("01x1", 4, False)
+    wide = "01" * 512
+    assert Value.fromStr(wide, 1024, False) is not \
+        Value.fromStr(wide, 1024, False)
+    assert Value.fromInt(3, 1024, False) is not Value.fromInt(3, 1024, False)
+    # 全 x/z 的宽值的键很小, 仍然驻留
+    assert Value.fromStr("x", 1024, False) is Value.fromStr("x", 1024, False)
+    assert Value.cacheInfo().size == 3
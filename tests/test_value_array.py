@@ -0,0 +1,16 @@
+import pytest
+
+from vunit_py import Value
+
+numpy = pytest.importorskip("numpy")
+from vunit_py.value_array import ValueArray  # noqa: E402
+
+
+def test_from_array_wide():
+    a = ValueArray.fromArray(numpy.array([1, 2, 3]), 100, False)
+    assert [int(v) for v in a] == [1, 2, 3]
+    assert list(a) == [Value.fromInt(v, 100, False) for v in [1, 2, 3]]
+    s = ValueArray.fromArray(numpy.array([-1, 5], dtype=numpy.int64), 65, True)
+    assert [int(v) for v in s] == [-1, 5]
+    x = ValueArray.fromArray(numpy.array(["x", "z"]), 70, False)
+    assert [str(v) for v in x] == ["x" * 70, "z" * 70]
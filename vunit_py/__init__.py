@@ -1,4 +1,11 @@
 from .value import Value
+from .sequence import Lazy, Repeat, ValueList, ValueSequence
+from .stimulus import Choice, Uniform
 from .test import Test
 from .signal_helper import CycleHelper, SignalHelper
-from .module_parser import ModuleParser
\ No newline at end of file
+from .module_parser import ModuleParser
+
+try:
+    from .value_array import ValueArray
+except ImportError:  # NumPy 为可选依赖
+    pass
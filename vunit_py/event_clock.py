@@ -1,4 +1,4 @@
-from typing import Sequence
+from typing import Optional, Sequence
 
 
 class EventClock:
@@ -77,3 +77,97 @@ class EventClock:
             t -= len(self.prelude)
         n = len(self.ts)
         return s + t // n * self.ts[-1] + self.ts[t % n]
+
+    def count(self, ts: int) -> int:
+        """
+        时间点 ts 及之前的事件个数
+        """
+        hi = 1
+        while self[hi - 1] <= ts:
+            hi *= 2
+        lo = 0
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self[mid] <= ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+class ClockPort:
+    """
+    自由运行的时钟端口, 生成为测试文件中的循环, 不需要数据文件
+    """
+    __period: int
+    __high: int
+    __phase: int
+    __until: Optional[int]
+
+    def __init__(self, period: int, duty: float, phase: Optional[int],
+                 until: Optional[int]):
+        """
+        period: 时钟周期
+        duty: 占空比, 即高电平时间占周期的比例
+        phase: 第一个上升沿的时间, 为 None 时等于低电平时间, 即时钟从零点开始的半个周期为低
+        until: 时钟停止的时间, 此时间及之后不再有上升沿, 为 None 时一直运行
+
+          假设 period = 10, duty = 0.5, phase = None, 则时钟在 0 时为 0,
+        在 5, 15, 25, ... 变为 1, 在 10, 20, 30, ... 变为 0
+        """
+        assert isinstance(period, int) and period > 1, "时钟周期不是大于 1 的整数"
+        high = round(period * duty)
+        msg = "占空比对应的高电平时间不在 (0, {}) 之内：{}".format(period, high)
+        assert 0 < high < period, msg
+        if phase is None:
+            phase = period - high
+        assert isinstance(phase, int) and phase >= 0, "时钟相位不是非负整数"
+        assert until is None or until >= 0, "时钟停止时间为负"
+        self.__period = period
+        self.__high = high
+        self.__phase = phase
+        self.__until = until
+
+    @property
+    def period(self) -> int:
+        """
+        时钟周期
+        """
+        return self.__period
+
+    @property
+    def high(self) -> int:
+        """
+        每个周期的高电平时间
+        """
+        return self.__high
+
+    @property
+    def low(self) -> int:
+        """
+        每个周期的低电平时间
+        """
+        return self.__period - self.__high
+
+    @property
+    def phase(self) -> int:
+        """
+        第一个上升沿的时间
+        """
+        return self.__phase
+
+    @property
+    def until(self) -> Optional[int]:
+        """
+        时钟停止的时间
+        """
+        return self.__until
+
+    @property
+    def cycles(self) -> Optional[int]:
+        """
+        上升沿的个数, 一直运行时为 None
+        """
+        if self.__until is None:
+            return None
+        return max(0, -(-(self.__until - self.__phase) // self.__period))
@@ -0,0 +1,180 @@
+import typing
+from typing import Dict, Iterator, Set, Union
+from pathlib import Path
+import contextlib
+import hashlib
+import json
+import os
+
+
+class HashedWriter(object):
+    """
+    写入文件的同时计算内容的 SHA-256
+    """
+    __file: typing.TextIO
+    __hash: "hashlib._Hash"
+    __size: int
+
+    def __init__(self, file: typing.TextIO):
+        self.__file = file
+        self.__hash = hashlib.sha256()
+        self.__size = 0
+
+    def write(self, s: str) -> None:
+        b = s.encode()
+        self.__hash.update(b)
+        self.__size += len(b)
+        self.__file.write(s)
+
+    @property
+    def size(self) -> int:
+        """
+        已写入的字节数
+        """
+        return self.__size
+
+    def hexdigest(self) -> str:
+        """
+        已写入内容的 SHA-256
+        """
+        return self.__hash.hexdigest()
+
+
+class Manifest(object):
+    """
+    生成文件的清单, 以 JSON 保存每个文件名及其内容的 SHA-256、大小和修改时间
+
+    生成的文件先写入临时文件, 内容与已有文件相同时保留已有文件 (及其修改时间),
+    使 VUnit 只重新编译内容变化的测试。已有文件的大小或修改时间与清单不一致时,
+    重新读取文件计算 SHA-256
+    """
+    __path: Path
+    # {文件名: {"sha256": str, "size": int, "mtime_ns": int}}
+    __entries: Dict[str, Dict[str, Union[str, int]]]
+    __changed: Set[str]
+    __written: Set[str]
+    __bytesWritten: int
+
+    def __init__(self, path: Path):
+        """
+        path: 清单文件路径, 不存在或无法读取时视为空清单
+        """
+        self.__path = path
+        self.__entries = {}
+        self.__changed = set()
+        self.__written = set()
+        self.__bytesWritten = 0
+        try:
+            with open(path, "r") as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                self.__entries = {
+                    k: v
+                    for k, v in entries.items() if isinstance(v, dict)
+                }
+        except (OSError, ValueError):
+            pass
+
+    @property
+    def changed(self) -> Set[str]:
+        """
+        本次写入 (内容变化或新建) 的文件名
+        """
+        return self.__changed
+
+    @property
+    def bytesWritten(self) -> int:
+        """
+        本次写入的字节数 (包括内容未变化的文件)
+        """
+        return self.__bytesWritten
+
+    @contextlib.contextmanager
+    def open(self, path: Path) -> Iterator[HashedWriter]:
+        """
+        以文本方式写入文件 path, 内容与已有文件相同时不修改已有文件
+        """
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            with open(tmp, "w") as f:
+                writer = HashedWriter(f)
+                yield writer
+            digest = writer.hexdigest()
+            self.__bytesWritten += writer.size
+            if path.is_file() and self.__known(path) == digest:
+                os.remove(tmp)
+            else:
+                os.replace(tmp, path)
+                self.__changed.add(path.name)
+            self.__written.add(path.name)
+            st = path.stat()
+            self.__entries[path.name] = {
+                "sha256": digest,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns
+            }
+        finally:
+            if tmp.exists():
+                os.remove(tmp)
+
+    def branch(self) -> "Manifest":
+        """
+        生成一个以当前记录为基础、本次写入为空的清单, 用于在子进程中写入文件,
+        写入之后由 merge 合并回当前清单
+        """
+        m = Manifest.__new__(Manifest)
+        m.__path = self.__path
+        m.__entries = dict(self.__entries)
+        m.__changed = set()
+        m.__written = set()
+        m.__bytesWritten = 0
+        return m
+
+    def merge(self, other: "Manifest") -> None:
+        """
+        合并由 branch 生成的清单中本次写入的文件
+        """
+        for name in other.__written:
+            self.__entries[name] = other.__entries[name]
+        self.__changed |= other.__changed
+        self.__written |= other.__written
+        self.__bytesWritten += other.__bytesWritten
+
+    def digest(self) -> str:
+        """
+        本次写入的所有文件名及其 SHA-256 (按文件名排序) 的 SHA-256
+        """
+        h = hashlib.sha256()
+        for name in sorted(self.__written):
+            h.update("{} {}\n".format(name,
+                                       self.__entries[name]["sha256"]).encode())
+        return h.hexdigest()
+
+    def save(self) -> None:
+        """
+        保存清单
+        """
+        text = json.dumps(self.__entries, indent=2, sort_keys=True) + "\n"
+        try:
+            with open(self.__path, "r") as f:
+                if f.read() == text:
+                    return
+        except OSError:
+            pass
+        with open(self.__path, "w") as f:
+            f.write(text)
+
+    def __known(self, path: Path) -> str:
+        """
+        已有文件的 SHA-256, 清单中没有记录或记录已过期时读取文件计算
+        """
+        entry = self.__entries.get(path.name)
+        st = path.stat()
+        if entry is not None and entry.get("size") == st.st_size and \
+                entry.get("mtime_ns") == st.st_mtime_ns:
+            return str(entry.get("sha256"))
+        h = hashlib.sha256()
+        with open(path, "r") as f:
+            for line in f:
+                h.update(line.encode())
+        return h.hexdigest()
@@ -0,0 +1,47 @@
+from typing import Any, Callable, List, Sequence, Tuple
+import multiprocessing
+import traceback
+
+# 子进程通过 fork 继承的任务列表, 任务本身 (及其中的 Lazy 函数等) 不需要可序列化
+_TASKS: List[Callable[[], Any]] = []
+
+
+def _run(i: int) -> Tuple[bool, Any]:
+    try:
+        return True, _TASKS[i]()
+    except BaseException:
+        return False, traceback.format_exc()
+
+
+def runAll(names: Sequence[str], tasks: Sequence[Callable[[], Any]],
+           jobs: int) -> List[Any]:
+    """
+    names: 任务名, 用于报告错误
+    tasks: 任务, 返回值需要可序列化
+    jobs: 进程数
+
+    在进程池中执行所有任务, 按任务顺序返回结果。任务在 fork 出的子进程中执行,
+    对任务对象的修改不会反映到当前进程, 任一任务出错时, 在所有任务结束后报告每个出错任务的
+    名称和错误信息。jobs 不大于 1、系统不支持 fork 或当前进程已是进程池中的子进程 (不能再创建
+    子进程) 时在当前进程中顺序执行, 错误直接抛出
+    """
+    assert len(names) == len(tasks), "任务名与任务数量不一致"
+    if jobs <= 1 or len(tasks) <= 1 or \
+            "fork" not in multiprocessing.get_all_start_methods() or \
+            multiprocessing.current_process().daemon:
+        return [t() for t in tasks]
+    global _TASKS
+    _TASKS = list(tasks)
+    try:
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(min(jobs, len(tasks))) as pool:
+            results = pool.map(_run, range(len(tasks)), chunksize=1)
+    finally:
+        _TASKS = []
+    errors = [
+        "{}:\n{}".format(n, r) for n, (ok, r) in zip(names, results) if not ok
+    ]
+    assert not errors, "{} 个任务出错：\n{}".format(len(errors),
+                                               "\n".join(errors))
+    return [r for _, r in results]
+
@@ -1,8 +1,18 @@
-from typing import List, Mapping, Optional, Protocol, Sequence, Union
+from typing import Mapping, Optional, Protocol, Sequence, Union
 from abc import abstractmethod
 from enum import Enum
+import mmap
 
 from .value import Value
+from .sequence import (ByteDef, ByteSequence, Lazy, LazySequence, Repeat,
+                       RepeatSequence, RunLengthSequence, ValueChain, ValueList,
+                       ValueSequence, compact)
+from .stimulus import Distribution, PortSpec, generate
+
+try:
+    import numpy
+except ImportError:  # NumPy 为可选依赖
+    numpy = None
 
 
 class PortType(Enum):
@@ -14,7 +24,8 @@ class PortType(Enum):
 
 
 ValueDef = Union[Value, int, str, bytes]
-SignalDef = Union[Sequence[ValueDef], Mapping[int, ValueDef], bytes]
+SignalDef = Union[Sequence[ValueDef], Mapping[int, ValueDef], ByteDef,
+                  ValueSequence, Lazy, Repeat, "numpy.ndarray"]
 
 
 class EventClockContainerProtocol(Protocol):
@@ -32,7 +43,7 @@ class Port:
     __signed: bool
     __clk: str
     __initValue: Optional[Value]
-    __seq: List[Value]
+    __seq: ValueSequence
     __parent: EventClockContainerProtocol
 
     def __init__(self, portType: PortType, width: int, signed: bool,
@@ -49,7 +60,7 @@ class Port:
         self.__signed = signed
         self.__clk = ""
         self.__initValue = None
-        self.__seq = []
+        self.__seq = ValueList([], width, signed)
         self.__parent = parent
 
     @property
@@ -89,7 +100,7 @@ class Port:
         return self.__initValue
 
     @property
-    def input(self) -> Sequence[Value]:
+    def input(self) -> ValueSequence:
         """
         端口输入
         """
@@ -97,7 +108,7 @@ class Port:
         return self.__seq
 
     @property
-    def output(self) -> Sequence[Value]:
+    def output(self) -> ValueSequence:
         """
         端口输出
         """
@@ -114,24 +125,35 @@ class Port:
         self.__clk = clk
         return self
 
-    def normalize(self, signal: SignalDef) -> Sequence[Value]:
+    def normalize(self, signal: SignalDef) -> ValueSequence:
         """
         将信号 signal 规范化为值序列
 
-        当 signal 为 bytes 时, 按端口宽度将信号分割为值序列
-        当 signal 为字典类型时, 按序号扩充为值序列。对于输入，填充之前的值，对于输出，填充 x
-        当 signal 为列表类型时, 直接返回
-        """
-        if isinstance(signal, bytes):
-            msg = "使用字节形式表达信号序列时，端口宽度不为 2 的幂次：{}".format(self.width)
-            assert (self.width & (self.width - 1)) == 0, msg
-            if self.width > 8:
-                msg = "使用字节形式表达信号序列时，序列长度不是端口宽度的倍数：{} | {}".format(
-                    len(signal) * 8, self.width)
-                assert (len(signal) % (self.width / 8) == 0), msg
-            return Value.fromBytes(signal,
-                                   len(signal) * 8,
-                                   False).slice(self.width, self.signed)
+        当 signal 为 bytes/bytearray/memoryview/mmap 时, 按端口宽度将信号分割为值序列,
+          不复制字节
+        当 signal 为字典类型时, 按序号扩充为游程编码的值序列。对于输入，填充之前的值，对于输出，填充 x
+        当 signal 为 NumPy 数组时, 转换为 ValueArray
+        当 signal 为 Repeat 时, 转换为只保存一个周期的 RepeatSequence
+        当 signal 为 Lazy 时, 转换为 LazySequence, 直到生成测试数据或检查输出时才生成值
+        当 signal 为值序列时, 直接返回
+        当 signal 为列表类型时, 逐个转换为值
+        """
+        if numpy is not None and isinstance(signal, numpy.ndarray):
+            from .value_array import ValueArray
+            return ValueArray.fromArray(signal, self.width, self.signed)
+        elif isinstance(signal, Repeat):
+            return RepeatSequence(self.normalize(signal.base), signal.count)
+        elif isinstance(signal, Lazy):
+            return LazySequence(signal, self.width, self.signed)
+        elif isinstance(signal, ValueSequence):
+            msg = "值序列的宽度或符号不匹配：{} != {}".format(
+                (signal.width, signal.signed), (self.width, self.signed))
+            assert signal.width == self.width and signal.signed == self.signed, msg
+            if isinstance(signal, ValueList):
+                return ValueList(signal, self.width, self.signed)
+            return signal
+        elif isinstance(signal, (bytes, bytearray, memoryview, mmap.mmap)):
+            return ByteSequence(signal, self.width, self.signed)
         elif isinstance(signal, Mapping):
             vs = sorted(
                 [(t, Value.fromAny(x, self.width, self.signed))
@@ -141,25 +163,42 @@ class Port:
             msg = "使用字典形式表达信号序列时，指定的序号小于当前序列长度：{} < {}".format(
                 vs[0][0], len(self.__seq))
             assert vs[0][0] >= len(self.__seq), msg
+            # 以游程编码保存, 填充的值不占用额外空间
             if self.portType == PortType.OUT:
-                values = [Value.fromStr("x", self.width, self.signed)
-                          ] * (vs[-1][0] + 1 - len(self.output))
-                for t, v in vs:
-                    values[t - len(self.output)] = v
+                fill = Value.fromStr("x", self.width, self.signed)
             else:
-                lastT = len(self.input) - 1
-                lastV = (self.input[-1] if self.input else
-                         self.initValue if self.initValue else Value.fromStr(
-                             "x", self.width, self.signed))
-                values = []
-                for t, v in vs:
-                    values += [lastV] * (t - lastT - 1)
-                    values.append(v)
-                    lastT = t
-                    lastV = v
+                fill = (self.input[-1] if self.input else
+                        self.initValue if self.initValue else Value.fromStr(
+                            "x", self.width, self.signed))
+            lastT = len(self.__seq) - 1
+            values = RunLengthSequence([], self.width, self.signed)
+            for t, v in vs:
+                values.append(fill, t - lastT - 1)
+                values.append(v)
+                lastT = t
+                if self.portType == PortType.IN:
+                    fill = v
             return values
         else:
-            return [Value.fromAny(x, self.width, self.signed) for x in signal]
+            return ValueList(
+                [Value.fromAny(x, self.width, self.signed) for x in signal],
+                self.width, self.signed)
+
+    def random(self,
+               length: int,
+               seed: int,
+               dist: Optional[Distribution] = None,
+               x_prob: float = 0.0) -> "Port":
+        """
+        length: 信号长度
+        seed: 随机种子
+        dist: 值的分布, 为 None 时在端口的取值范围内均匀分布
+        x_prob: 每个值为 x 的概率
+
+        在输入端口信号末尾添加随机信号, 多个端口之间有约束时使用 Test.randomize
+        """
+        spec = PortSpec(self.width, self.signed, dist, x_prob)
+        return self << generate({"": spec}, length, seed, [])[""]
 
     def __floordiv__(self, input: ValueDef) -> "Port":
         """
@@ -178,7 +217,7 @@ class Port:
         添加端口输出
         """
         assert self.portType == PortType.IN, "输出端口不可定义输入（输出定义方式为 >>）"
-        self.__seq += self.normalize(input)
+        self.__extend(self.normalize(input))
         return self
 
     def __rshift__(self, output: SignalDef) -> "Port":
@@ -186,5 +225,30 @@ class Port:
         添加端口输入
         """
         assert self.portType == PortType.OUT, "输入端口不可定义输出（输入定义方式为 <<）"
-        self.__seq += self.normalize(output)
+        self.__extend(self.normalize(output))
         return self
+
+    def __extend(self, values: ValueSequence) -> None:
+        """
+        在序列末尾添加值
+
+        ValueList 与 ValueArray 相接时整个序列转换为 ValueArray,
+        其他类型相接时以 ValueChain 保存, 各段保持原有的存储方式
+        """
+        if not values:
+            return
+        if not self.__seq:
+            if isinstance(values, ValueChain):
+                values = ValueChain(values.parts, self.width, self.signed)
+            self.__seq = values
+            return
+        if isinstance(self.__seq, ValueList) and isinstance(values, ValueList):
+            self.__seq.extend(values)
+            return
+        merged = compact(self.__seq, values)
+        if merged is not None:
+            self.__seq = merged
+            return
+        if not isinstance(self.__seq, ValueChain):
+            self.__seq = ValueChain([self.__seq], self.width, self.signed)
+        self.__seq.append(values)
@@ -0,0 +1,162 @@
+from typing import Any, Dict, Iterator, List
+from pathlib import Path
+import contextlib
+import json
+import time
+import tracemalloc
+
+# 记录中的计数项, 汇总时按阶段相加
+COUNTERS = ["seconds", "bytes_written", "bytes_read", "events", "samples"]
+
+
+class Profiler(object):
+    """
+    记录测试每个阶段的开始时间、耗时、读写字节数、事件数、值的个数和 Python 内存峰值
+
+    "shared" 为真的记录 (如 VUnit 的编译) 由所有测试共享, 汇总时不计入任何一个测试
+
+    内存峰值由 tracemalloc 记录, 是整个进程在该阶段之内的峰值,
+    与其他线程中同时进行的阶段互相影响。未启用时不记录, 没有额外开销
+    """
+    __enabled: bool
+    # [{"test": str, "phase": str, "start": float, "seconds": float, ...}]
+    __records: List[Dict[str, Any]]
+
+    def __init__(self):
+        self.__enabled = False
+        self.__records = []
+
+    @property
+    def enabled(self) -> bool:
+        """
+        是否记录
+        """
+        return self.__enabled
+
+    @enabled.setter
+    def enabled(self, enabled: bool) -> None:
+        self.__enabled = enabled
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        """
+        所有记录
+        """
+        return self.__records
+
+    @records.setter
+    def records(self, records: List[Dict[str, Any]]) -> None:
+        self.__records = records
+
+    @contextlib.contextmanager
+    def phase(self, test: str, name: str) -> Iterator[Dict[str, Any]]:
+        """
+        test: 测试名
+        name: 阶段名
+
+        记录一个阶段, 返回的字典用于填写读写字节数等计数
+        """
+        record: Dict[str, Any] = {}
+        if not self.__enabled:
+            yield record
+            return
+        if tracemalloc.is_tracing():
+            _resetPeak()
+        start = time.time()
+        try:
+            yield record
+        finally:
+            record.update({
+                "test": test,
+                "phase": name,
+                "start": start,
+                "seconds": time.time() - start
+            })
+            if tracemalloc.is_tracing():
+                record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            self.__records.append(record)
+
+    @staticmethod
+    def export(records: List[Dict[str, Any]], path: Path) -> None:
+        """
+        records: 所有测试的记录
+        path: 输出文件夹
+
+        导出汇总 summary.json 和 Chrome 跟踪事件文件 trace.json
+        (可以用 chrome://tracing 或 Perfetto 打开)。共享的记录汇总在 "shared" 中,
+        不计入各测试的耗时和排序
+        """
+        path.mkdir(parents=True, exist_ok=True)
+        tests: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        shared: Dict[str, Dict[str, Any]] = {}
+        phases: Dict[str, float] = {}
+        for r in records:
+            target = shared if r.get("shared") else tests.setdefault(
+                r["test"], {})
+            phase = target.setdefault(r["phase"], {})
+            for k in COUNTERS:
+                if k in r:
+                    phase[k] = phase.get(k, 0) + r[k]
+            if "peak_bytes" in r:
+                phase["peak_bytes"] = max(phase.get("peak_bytes", 0),
+                                          r["peak_bytes"])
+            if "status" in r:
+                phase["status"] = r["status"]
+            phases[r["phase"]] = phases.get(r["phase"], 0) + r["seconds"]
+        totals = {
+            t: sum([p["seconds"] for p in ps.values()])
+            for t, ps in tests.items()
+        }
+        summary = {
+            "phases": phases,
+            "slowest": sorted(totals, key=lambda t: -totals[t]),
+            "tests": tests,
+            "shared": shared
+        }
+        with open(path / "summary.json", "w") as f:
+            json.dump(summary, f, indent=2)
+            f.write("\n")
+
+        tids = {t: i for i, t in enumerate(sorted(tests), 1)}
+        names = {i: t for t, i in tids.items()}
+        if shared:
+            names[0] = "shared"
+        events: List[Dict[str, Any]] = [{
+            "name": "thread_name",
+            "ph": "M",
+            "pid": 1,
+            "tid": i,
+            "args": {
+                "name": t
+            }
+        } for i, t in sorted(names.items())]
+        for r in records:
+            events.append({
+                "name": r["phase"],
+                "cat": "vunit_py",
+                "ph": "X",
+                "ts": int(r["start"] * 1e6),
+                "dur": int(r["seconds"] * 1e6),
+                "pid": 1,
+                "tid": 0 if r.get("shared") else tids[r["test"]],
+                "args": {
+                    k: v
+                    for k, v in r.items()
+                    if k not in ("test", "phase", "start", "seconds", "shared")
+                }
+            })
+        with open(path / "trace.json", "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            f.write("\n")
+
+
+def _resetPeak() -> None:
+    """
+    将 tracemalloc 的峰值重置为当前值, Python 3.9 之前只能重新开始记录
+    """
+    reset = getattr(tracemalloc, "reset_peak", None)
+    if reset is not None:
+        reset()
+    else:
+        tracemalloc.stop()
+        tracemalloc.start()
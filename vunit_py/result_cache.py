@@ -0,0 +1,104 @@
+from typing import Callable, Dict, Iterable, Set
+from pathlib import Path
+import hashlib
+import os
+import threading
+
+
+class ResultCache(object):
+    """
+    仿真结果缓存
+
+    每个通过的测试文件对应缓存文件夹中以其键命名的文件, 键由测试文件、测试数据、
+    被测模块源文件和仿真器等计算得到。文件的修改时间为最近一次使用的时间,
+    文件数超过容量时删除最久未使用的文件
+
+    命中的测试文件不加入 VUnit, 由 Test.run 直接报告通过。VUnit 不能注入测试结果,
+    因此它们不出现在 VUnit 的报告和 xunit 等文件中
+    """
+    __path: Path
+    __size: int
+    # {键: 尚未通过的检查数}
+    __pending: Dict[str, int]
+    __failed: Set[str]
+    __lock: threading.Lock
+
+    def __init__(self, path: Path, size: int):
+        """
+        path: 缓存文件夹
+        size: 最多保存的结果数
+        """
+        assert size > 0, "缓存容量不是正整数：{}".format(size)
+        path.mkdir(parents=True, exist_ok=True)
+        self.__path = path
+        self.__size = size
+        self.__pending = {}
+        self.__failed = set()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def key(parts: Iterable[str]) -> str:
+        """
+        由各部分计算缓存的键
+        """
+        h = hashlib.sha256()
+        for p in parts:
+            h.update(p.encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def hit(self, key: str) -> bool:
+        """
+        键对应的测试文件是否已经通过, 命中时更新其使用时间
+        """
+        path = self.__path / key
+        try:
+            os.utime(path)
+        except OSError:
+            return False
+        return True
+
+    def wrap(self, key: str, name: str,
+             check: Callable[[], bool]) -> Callable[[], bool]:
+        """
+        key: 测试文件的键
+        name: 测试文件名, 写入缓存文件便于查看
+        check: 测试文件的一个检查函数
+
+        包装检查函数, 测试文件的所有检查函数都通过之后记录结果
+        """
+        with self.__lock:
+            self.__pending[key] = self.__pending.get(key, 0) + 1
+
+        # 此函数不能有类型，否则 VUnit 不工作
+        def wrapped():
+            passed = check()
+            with self.__lock:
+                if not passed:
+                    self.__failed.add(key)
+                self.__pending[key] -= 1
+                if self.__pending[key] or key in self.__failed:
+                    return passed
+                with open(self.__path / key, "w") as f:
+                    f.write(name + "\n")
+                self.__evict()
+            return passed
+
+        return wrapped
+
+    def __evict(self) -> None:
+        """
+        删除最久未使用的结果, 直到不超过容量
+        """
+        entries = []
+        for p in self.__path.iterdir():
+            try:
+                entries.append((p.stat().st_mtime_ns, p))
+            except OSError:
+                pass
+        entries.sort()
+        for _, p in entries[:max(0, len(entries) - self.__size)]:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
@@ -0,0 +1,622 @@
+import typing
+from typing import (TYPE_CHECKING, Callable, Iterable, Iterator, List,
+                    Optional, Sequence, Tuple, Union)
+from abc import abstractmethod
+import bisect
+import itertools
+import mmap
+
+from .value import Value, ValueDef
+
+if TYPE_CHECKING:  # port 引用本模块, 只在类型检查时导入
+    from .port import SignalDef
+
+
+class ValueSequence(Sequence[Value]):
+    """
+    值序列, 所有值的宽度和符号一致
+    """
+    __width: int
+    __signed: bool
+
+    def __init__(self, width: int, signed: bool):
+        """
+        width: 值宽度
+        signed: 值是否有符号
+        """
+        assert width > 0, "宽度不是正整数"
+        self.__width = width
+        self.__signed = signed
+
+    @property
+    def width(self) -> int:
+        """
+        值宽度
+        """
+        return self.__width
+
+    @property
+    def signed(self) -> bool:
+        """
+        值是否有符号
+        """
+        return self.__signed
+
+    @property
+    def randomAccess(self) -> bool:
+        """
+        是否可以随机读取, 即是否可以重复读取
+        """
+        return True
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def at(self, t: int) -> Value:
+        """
+        序号 t (非负且不越界) 所对应的值
+        """
+        raise NotImplementedError()
+
+    def window(self, start: int, stop: int) -> "ValueSequence":
+        """
+        序号 [start, stop) 之间的子序列
+        """
+        return ValueList([self.at(t) for t in range(start, stop)], self.width,
+                         self.signed)
+
+    @typing.overload
+    def __getitem__(self, t: int) -> Value:
+        ...
+
+    @typing.overload
+    def __getitem__(self, t: slice) -> "ValueSequence":
+        ...
+
+    def __getitem__(self, t: Union[int, slice]):
+        if isinstance(t, slice):
+            start, stop, step = t.indices(len(self))
+            if step != 1:
+                return ValueList([self.at(i) for i in range(start, stop, step)],
+                                 self.width, self.signed)
+            return self.window(start, max(start, stop))
+        n = len(self)
+        if t < 0:
+            t += n
+        if not 0 <= t < n:
+            raise IndexError("序号越界：{}".format(t))
+        return self.at(t)
+
+    def __iter__(self) -> Iterator[Value]:
+        for t in range(len(self)):
+            yield self.at(t)
+
+    def __repr__(self) -> str:
+        return "[{}]".format(", ".join([str(v) for v in self]))
+
+    def strings(self) -> Iterator[str]:
+        """
+        按顺序生成每个值的二进制字符串
+        """
+        for v in self:
+            yield str(v)
+
+    def stringRuns(self) -> Iterator[Tuple[str, int]]:
+        """
+        按顺序生成 (二进制字符串, 连续重复次数)
+        """
+        for s, g in itertools.groupby(self.strings()):
+            yield s, sum(1 for _ in g)
+
+
+class ValueList(ValueSequence):
+    """
+    以列表存储的值序列
+    """
+    __values: List[Value]
+
+    def __init__(self, values: Iterable[Value], width: int, signed: bool):
+        """
+        values: 值序列, 宽度和符号需要与 width 和 signed 一致
+        width: 值宽度
+        signed: 值是否有符号
+        """
+        super().__init__(width, signed)
+        self.__values = list(values)
+
+    def __len__(self) -> int:
+        return len(self.__values)
+
+    def at(self, t: int) -> Value:
+        return self.__values[t]
+
+    def window(self, start: int, stop: int) -> ValueSequence:
+        return ValueList(self.__values[start:stop], self.width, self.signed)
+
+    def __iter__(self) -> Iterator[Value]:
+        return iter(self.__values)
+
+    def extend(self, values: Sequence[Value]) -> None:
+        """
+        在序列末尾添加值
+        """
+        self.__values += values
+
+
+class RunLengthSequence(ValueSequence):
+    """
+    以游程编码存储的值序列, 连续相同的值只保存一次, 适用于长时间保持不变的信号
+    """
+    __values: List[Value]
+    # 每个游程的结束序号 (不含)
+    __ends: List[int]
+
+    def __init__(self, runs: Iterable[Tuple[Value, int]], width: int,
+                 signed: bool):
+        """
+        runs: (值, 连续重复次数) 序列, 值的宽度和符号需要与 width 和 signed 一致
+        width: 值宽度
+        signed: 值是否有符号
+        """
+        super().__init__(width, signed)
+        self.__values = []
+        self.__ends = []
+        for v, n in runs:
+            self.append(v, n)
+
+    def __len__(self) -> int:
+        return self.__ends[-1] if self.__ends else 0
+
+    def at(self, t: int) -> Value:
+        return self.__values[bisect.bisect_right(self.__ends, t)]
+
+    def window(self, start: int, stop: int) -> ValueSequence:
+        res = RunLengthSequence([], self.width, self.signed)
+        i = bisect.bisect_right(self.__ends, start)
+        while start < stop:
+            end = min(stop, self.__ends[i])
+            res.append(self.__values[i], end - start)
+            start = end
+            i += 1
+        return res
+
+    def runs(self) -> Iterator[Tuple[Value, int]]:
+        """
+        按顺序生成 (值, 连续重复次数)
+        """
+        last = 0
+        for v, e in zip(self.__values, self.__ends):
+            yield v, e - last
+            last = e
+
+    def __iter__(self) -> Iterator[Value]:
+        for v, n in self.runs():
+            yield from itertools.repeat(v, n)
+
+    def strings(self) -> Iterator[str]:
+        for s, n in self.stringRuns():
+            yield from itertools.repeat(s, n)
+
+    def stringRuns(self) -> Iterator[Tuple[str, int]]:
+        for v, n in self.runs():
+            yield str(v), n
+
+    def append(self, v: Value, n: int = 1) -> None:
+        """
+        在序列末尾添加 n 个值 v
+        """
+        assert n >= 0, "重复次数为负：{}".format(n)
+        if not n:
+            return
+        msg = "值的宽度或符号不匹配：{} != {}".format((v.width, v.signed),
+                                               (self.width, self.signed))
+        assert v.width == self.width and v.signed == self.signed, msg
+        if self.__values and self.__values[-1] == v:
+            self.__ends[-1] += n
+            return
+        self.__values.append(v)
+        self.__ends.append(len(self) + n)
+
+
+class RepeatSequence(ValueSequence):
+    """
+    周期性的值序列, 由基本序列重复 count 次而成, 只保存一个周期
+
+    基本序列本身也是周期性序列时, 展开为最内层的基本序列
+    """
+    __base: ValueSequence
+    __count: int
+
+    def __init__(self, base: ValueSequence, count: int):
+        """
+        base: 基本序列
+        count: 重复次数
+        """
+        super().__init__(base.width, base.signed)
+        assert count >= 0, "重复次数为负：{}".format(count)
+        if isinstance(base, RepeatSequence):
+            count *= base.count
+            base = base.base
+        self.__base = base
+        self.__count = count if base else 0
+
+    @property
+    def base(self) -> ValueSequence:
+        """
+        基本序列, 即一个周期
+        """
+        return self.__base
+
+    @property
+    def count(self) -> int:
+        """
+        重复次数
+        """
+        return self.__count
+
+    @property
+    def randomAccess(self) -> bool:
+        return self.__base.randomAccess
+
+    def __len__(self) -> int:
+        return len(self.__base) * self.__count
+
+    def at(self, t: int) -> Value:
+        return self.__base.at(t % len(self.__base))
+
+    def window(self, start: int, stop: int) -> ValueSequence:
+        n = len(self.__base)
+        first = -(-start // n)
+        last = stop // n
+        if first >= last:
+            return super().window(start, stop)
+        parts = [
+            self.__base.window(start % n, n) if start % n else None,
+            RepeatSequence(self.__base, last - first),
+            self.__base.window(0, stop % n) if stop % n else None
+        ]
+        return ValueChain([p for p in parts if p is not None], self.width,
+                          self.signed)
+
+    def __iter__(self) -> Iterator[Value]:
+        base = list(self.__base)
+        for _ in range(self.__count):
+            yield from base
+
+    def strings(self) -> Iterator[str]:
+        base = list(self.__base.strings())
+        for _ in range(self.__count):
+            yield from base
+
+    def stringRuns(self) -> Iterator[Tuple[str, int]]:
+        base = list(self.__base.stringRuns())
+        if len(base) == 1:
+            yield base[0][0], base[0][1] * self.__count
+            return
+        for _ in range(self.__count):
+            yield from base
+
+
+class Repeat(object):
+    """
+    周期性信号, 用于 Port 的 << 和 >>, 表示将 base 重复 count 次
+
+    base 可以是任意信号定义, 包括另一个 Repeat。只包含一个 Repeat 的输入端口在测试文件中
+    只保存一个周期, 并用循环序号读取, 数据大小与重复次数无关
+    """
+    __base: "SignalDef"
+    __count: int
+
+    def __init__(self, base: "SignalDef", count: int):
+        """
+        base: 一个周期的信号
+        count: 重复次数
+        """
+        assert count >= 0, "重复次数为负：{}".format(count)
+        self.__base = base
+        self.__count = count
+
+    @property
+    def base(self) -> "SignalDef":
+        """
+        一个周期的信号
+        """
+        return self.__base
+
+    @property
+    def count(self) -> int:
+        """
+        重复次数
+        """
+        return self.__count
+
+
+ByteDef = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+class ByteSequence(ValueSequence):
+    """
+    以字节存储的值序列, 字节从前到后从高到低依次展开后按宽度分割
+
+    不复制传入的字节 (bytes/bytearray/memoryview/mmap), 宽度需要为 2 的幂次
+    """
+    # 每次展开的字节数上限, 用于限制 strings() 的内存占用
+    BLOCK_BYTES = 1 << 16
+
+    __data: memoryview
+
+    def __init__(self, data: ByteDef, width: int, signed: bool):
+        """
+        data: 字节序列
+        width: 值宽度
+        signed: 值是否有符号
+        """
+        super().__init__(width, signed)
+        msg = "使用字节形式表达信号序列时，端口宽度不为 2 的幂次：{}".format(width)
+        assert (width & (width - 1)) == 0, msg
+        self.__data = memoryview(data).cast("B")
+        if width > 8:
+            msg = "使用字节形式表达信号序列时，序列长度不是端口宽度的倍数：{} | {}".format(
+                len(self.__data) * 8, width)
+            assert len(self.__data) % (width // 8) == 0, msg
+
+    def __len__(self) -> int:
+        return len(self.__data) * 8 // self.width
+
+    def at(self, t: int) -> Value:
+        w = self.width
+        if w >= 8:
+            n = w // 8
+            v = int.from_bytes(self.__data[t * n:(t + 1) * n], "big")
+        else:
+            shift = 8 - w - t * w % 8
+            v = (self.__data[t * w // 8] >> shift) & ((1 << w) - 1)
+        return Value.fromPlanes(v, 0, 0, w, self.signed)
+
+    def window(self, start: int, stop: int) -> ValueSequence:
+        if self.width < 8:
+            n = 8 // self.width
+            if start % n or stop % n:
+                return super().window(start, stop)
+            return ByteSequence(self.__data[start // n:stop // n], self.width,
+                                self.signed)
+        n = self.width // 8
+        return ByteSequence(self.__data[start * n:stop * n], self.width,
+                            self.signed)
+
+    def strings(self) -> Iterator[str]:
+        w = self.width
+        block = max(self.BLOCK_BYTES, w // 8)
+        for i in range(0, len(self.__data), block):
+            chunk = self.__data[i:i + block]
+            s = format(int.from_bytes(chunk, "big"),
+                       "0{}b".format(len(chunk) * 8))
+            if w == 1:
+                yield from s
+            else:
+                for j in range(0, len(s), w):
+                    yield s[j:j + w]
+
+
+class ValueChain(ValueSequence):
+    """
+    由多段值序列首尾相接而成的值序列
+    """
+    __parts: List[ValueSequence]
+    # 每段的起始序号
+    __starts: List[int]
+    __len: int
+    # 最后一段是否由本序列创建, 只有这种情况下才可以原地扩充
+    __ownsLast: bool
+
+    def __init__(self, parts: Iterable[ValueSequence], width: int,
+                 signed: bool):
+        """
+        parts: 各段值序列, 宽度和符号需要与 width 和 signed 一致
+        width: 值宽度
+        signed: 值是否有符号
+        """
+        super().__init__(width, signed)
+        self.__parts = []
+        self.__starts = []
+        self.__len = 0
+        self.__ownsLast = False
+        for p in parts:
+            self.append(p)
+
+    @property
+    def parts(self) -> Sequence[ValueSequence]:
+        """
+        各段值序列
+        """
+        return self.__parts
+
+    @property
+    def randomAccess(self) -> bool:
+        return all([p.randomAccess for p in self.__parts])
+
+    def __len__(self) -> int:
+        return self.__len
+
+    def at(self, t: int) -> Value:
+        i = bisect.bisect_right(self.__starts, t) - 1
+        return self.__parts[i].at(t - self.__starts[i])
+
+    def window(self, start: int, stop: int) -> ValueSequence:
+        parts = []
+        for s, p in zip(self.__starts, self.__parts):
+            a = max(start, s)
+            b = min(stop, s + len(p))
+            if a < b:
+                parts.append(p if b - a == len(p) else p.window(a - s, b - s))
+        return ValueChain(parts, self.width, self.signed)
+
+    def __iter__(self) -> Iterator[Value]:
+        for p in self.__parts:
+            yield from p
+
+    def strings(self) -> Iterator[str]:
+        for p in self.__parts:
+            yield from p.strings()
+
+    def stringRuns(self) -> Iterator[Tuple[str, int]]:
+        for p in self.__parts:
+            yield from p.stringRuns()
+
+    def append(self, values: ValueSequence) -> None:
+        """
+        在序列末尾添加一段值序列, 可以合并时与最后一段合并
+        """
+        msg = "值序列的宽度或符号不匹配：{} != {}".format(
+            (values.width, values.signed), (self.width, self.signed))
+        assert values.width == self.width and values.signed == self.signed, msg
+        if not values:
+            return
+        if self.__parts:
+            last = self.__parts[-1]
+            merged: Optional[ValueSequence]
+            if isinstance(last, ValueList) and isinstance(values, ValueList):
+                if not self.__ownsLast:
+                    last = ValueList(last, self.width, self.signed)
+                last.extend(values)
+                merged = last
+            elif isinstance(last, RunLengthSequence) and isinstance(
+                    values, RunLengthSequence):
+                if not self.__ownsLast:
+                    last = RunLengthSequence(last.runs(), self.width,
+                                             self.signed)
+                for v, n in values.runs():
+                    last.append(v, n)
+                merged = last
+            else:
+                merged = compact(last, values)
+            if merged is not None:
+                self.__len += len(values)
+                self.__parts[-1] = merged
+                self.__ownsLast = True
+                return
+        self.__parts.append(values)
+        self.__starts.append(self.__len)
+        self.__len += len(values)
+        self.__ownsLast = False
+
+
+def compact(a: ValueSequence, b: ValueSequence) -> Optional[ValueSequence]:
+    """
+    尝试将两段值序列合并为一段新的 ValueArray, 无法合并时返回 None
+
+    只有两段均为 ValueList 或 ValueArray 并且其中之一为 ValueArray 时可以合并
+    """
+    try:
+        from .value_array import ValueArray
+    except ImportError:  # NumPy 为可选依赖
+        return None
+    if not isinstance(a, ValueArray) and not isinstance(b, ValueArray):
+        return None
+    types = (ValueList, ValueArray)
+    if not isinstance(a, types) or not isinstance(b, types):
+        return None
+    return ValueArray.concat(
+        [ValueArray.fromSequence(a),
+         ValueArray.fromSequence(b)])
+
+
+class Lazy(object):
+    """
+    惰性信号, 用于 Port 的 << 和 >>, 在生成测试数据或检查输出时才按顺序生成值
+
+    source 为迭代器 (可迭代对象) 时只能顺序读取一次; 为函数 source(t) 时可以随机读取
+    """
+    __source: Union[Iterable[ValueDef], Callable[[int], ValueDef]]
+    __length: int
+
+    def __init__(self, source: Union[Iterable[ValueDef], Callable[[int],
+                                                                  ValueDef]],
+                 length: int):
+        """
+        source: 生成值的迭代器或函数 source(t) -> ValueDef
+        length: 信号长度
+        """
+        assert length >= 0, "信号长度为负：{}".format(length)
+        self.__source = source
+        self.__length = length
+
+    @property
+    def source(self) -> Union[Iterable[ValueDef], Callable[[int], ValueDef]]:
+        """
+        生成值的迭代器或函数
+        """
+        return self.__source
+
+    @property
+    def length(self) -> int:
+        """
+        信号长度
+        """
+        return self.__length
+
+
+class LazySequence(ValueSequence):
+    """
+    惰性值序列, 每次读取时由 Lazy 的迭代器或函数生成值, 不保存生成的值
+    """
+    __source: Union[Iterator[ValueDef], Callable[[int], ValueDef]]
+    __length: int
+    __consumed: bool
+
+    def __init__(self, lazy: Lazy, width: int, signed: bool):
+        """
+        lazy: 惰性信号
+        width: 值宽度
+        signed: 值是否有符号
+        """
+        super().__init__(width, signed)
+        source = lazy.source
+        self.__source = source if callable(source) else iter(source)
+        self.__length = lazy.length
+        self.__consumed = False
+
+    @property
+    def randomAccess(self) -> bool:
+        """
+        是否可以随机读取, 即是否由函数生成
+        """
+        return callable(self.__source)
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def __repr__(self) -> str:
+        return "Lazy({})".format(self.__length)
+
+    def at(self, t: int) -> Value:
+        assert self.randomAccess, "迭代器形式的惰性信号只能顺序读取一次"
+        return Value.fromAny(self.__source(t), self.width, self.signed)
+
+    def window(self, start: int, stop: int) -> ValueSequence:
+        assert self.randomAccess, "迭代器形式的惰性信号只能顺序读取一次"
+        source = self.__source
+        return LazySequence(Lazy(lambda t: source(start + t), stop - start),
+                            self.width, self.signed)
+
+    def __iter__(self) -> Iterator[Value]:
+        w = self.width
+        s = self.signed
+        if self.randomAccess:
+            for t in range(self.__length):
+                yield Value.fromAny(self.__source(t), w, s)
+            return
+        assert not self.__consumed, "迭代器形式的惰性信号只能顺序读取一次"
+        self.__consumed = True
+        n = 0
+        for v in itertools.islice(self.__source, self.__length):
+            yield Value.fromAny(v, w, s)
+            n += 1
+        assert n == self.__length, "惰性信号长度不足：{} < {}".format(
+            n, self.__length)
+
+    def strings(self) -> Iterator[str]:
+        for v in self:
+            yield str(v)
@@ -1,6 +1,7 @@
 from typing import Dict, List, Mapping, Optional, Sequence
 
 from .value import Value, ValueDef
+from .sequence import RunLengthSequence
 from .test import Test
 
 
@@ -243,27 +244,26 @@ class CycleHelper(object):
             assert p in self.__cycles, "输入端口未定义周期：{}".format(p)
             c = self.__cycles[p]
             minc = min(vs)
-            maxc = max(vs)
             delta = [c.ts[0] + c.interval - c.ts[-1]
                      ] + [c.ts[i] - c.ts[i - 1] for i in range(1, len(c.ts))]
             self.__test.addEventClock(
                 "ec_" + p, delta,
                 c.offset + (minc - 1) * c.interval + c.ts[-1])
             self.__test[p]**("ec_" + p)
-            lastV = vs[minc][-1]
-            for i in range(minc, maxc + 1):
-                if i in vs:
-                    self.__test[p] << vs[i]
-                    lastV = vs[i][-1]
-                else:
-                    self.__test[p] << [lastV] * len(c.ts)
+            last = minc
+            for i in sorted(vs):
+                if i > last + 1:
+                    # 未定义的周期保持之前的值, 以游程编码保存
+                    self.__test[p] << self.__hold(
+                        p, vs[last][-1], (i - last - 1) * len(c.ts))
+                self.__test[p] << vs[i]
+                last = i
         for p, vs in self.__outPorts.items():
             if not vs:
                 continue
             assert p in self.__cycles, "输出端口未定义周期：{}".format(p)
             c = self.__cycles[p]
             minc = min(vs)
-            maxc = max(vs)
             sts = [c.ts[0]]
             split = [False] * len(c.ts)
             for i in range(1, len(c.ts)):
@@ -279,15 +279,23 @@ class CycleHelper(object):
             self.__test.addEventClock(
                 "ec_" + p, delta, c.offset + (minc - 1) * c.interval + sts[-1])
             self.__test[p]**("ec_" + p)
-            lastV = vs[minc][-1]
-            for i in range(minc, maxc + 1):
-                if i in vs:
-                    self.__test[p] >> [
-                        vs[i][j] for j in range(len(c.ts))
-                        for _ in range(2 if split[j] else 1)
-                    ]
-                    lastV = vs[i][-1]
-                elif c.setup:
-                    self.__test[p] >> [lastV] * len(sts)
-                else:
-                    self.__test[p] >> ["x"] * len(sts)
+            last = minc
+            for i in sorted(vs):
+                if i > last + 1:
+                    # 未定义的周期, 有设置时间时保持之前的值, 否则不检查
+                    fill = (vs[last][-1] if c.setup else Value.fromStr(
+                        "x", self.__test[p].width, self.__test[p].signed))
+                    self.__test[p] >> self.__hold(p, fill,
+                                                  (i - last - 1) * len(sts))
+                self.__test[p] >> [
+                    vs[i][j] for j in range(len(c.ts))
+                    for _ in range(2 if split[j] else 1)
+                ]
+                last = i
+
+    def __hold(self, port: str, v: Value, n: int) -> RunLengthSequence:
+        """
+        n 个连续的值 v
+        """
+        return RunLengthSequence([(v, n)], self.__test[port].width,
+                                 self.__test[port].signed)
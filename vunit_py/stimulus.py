@@ -0,0 +1,227 @@
+from typing import (Any, Callable, Dict, List, Mapping, Optional, Sequence,
+                    Union)
+import random
+
+from .value import Value, ValueDef
+from .sequence import ValueList, ValueSequence
+
+try:
+    import numpy
+except ImportError:  # NumPy 为可选依赖
+    numpy = None
+
+# 拒绝采样的最大轮数
+MAX_REJECT_ROUNDS = 1000
+
+
+class Uniform(object):
+    """
+    [low, high] 之间均匀分布的整数
+    """
+    __low: int
+    __high: int
+
+    def __init__(self, low: int, high: int):
+        """
+        low: 最小值
+        high: 最大值 (包含)
+        """
+        assert low <= high, "取值范围为空：[{}, {}]".format(low, high)
+        self.__low = low
+        self.__high = high
+
+    @property
+    def low(self) -> int:
+        """
+        最小值
+        """
+        return self.__low
+
+    @property
+    def high(self) -> int:
+        """
+        最大值 (包含)
+        """
+        return self.__high
+
+
+class Choice(object):
+    """
+    从给定的值中按权重选取
+    """
+    __values: List[ValueDef]
+    __weights: Optional[List[float]]
+
+    def __init__(self,
+                 values: Sequence[ValueDef],
+                 weights: Optional[Sequence[float]] = None):
+        """
+        values: 可选的值
+        weights: 每个值的权重, 为 None 时等概率选取
+        """
+        assert values, "可选的值为空"
+        msg = "权重数量与值的数量不一致：{} != {}".format(
+            len(weights) if weights is not None else 0, len(values))
+        assert weights is None or len(weights) == len(values), msg
+        assert weights is None or (all([w >= 0 for w in weights]) and
+                                   sum(weights) > 0), "权重需要非负且不全为 0"
+        self.__values = list(values)
+        self.__weights = list(weights) if weights is not None else None
+
+    @property
+    def values(self) -> List[ValueDef]:
+        """
+        可选的值
+        """
+        return self.__values
+
+    @property
+    def weights(self) -> Optional[List[float]]:
+        """
+        每个值的权重
+        """
+        return self.__weights
+
+
+Distribution = Union[Uniform, Choice]
+# 约束: 参数为 {端口: 值}, 返回是否满足。使用 NumPy 时值为整数数组, 返回布尔数组,
+# 否则为单个整数, 返回布尔值。只使用算术和比较运算的约束在两种情况下都适用
+Constraint = Callable[[Dict[str, Any]], Any]
+
+
+class PortSpec(object):
+    """
+    一个端口的随机信号定义
+    """
+    width: int
+    signed: bool
+    dist: Distribution
+    xProb: float
+
+    def __init__(self, width: int, signed: bool, dist: Optional[Distribution],
+                 xProb: float):
+        assert 0 <= xProb <= 1, "x 的概率不在 [0, 1] 之间：{}".format(xProb)
+        if dist is None:
+            if signed:
+                dist = Uniform(-(1 << (width - 1)), (1 << (width - 1)) - 1)
+            else:
+                dist = Uniform(0, (1 << width) - 1)
+        self.width = width
+        self.signed = signed
+        self.dist = dist
+        self.xProb = xProb
+
+    def vectorized(self) -> bool:
+        """
+        是否可以用 NumPy 生成
+        """
+        if self.width > 64:
+            return False
+        if isinstance(self.dist, Uniform):
+            lo, hi = self.dist.low, self.dist.high
+        elif all([isinstance(v, int) for v in self.dist.values]):
+            lo, hi = min(self.dist.values), max(self.dist.values)
+        else:
+            return False
+        # 取值范围需要能用 int64 或 uint64 表示
+        return -(1 << 63) <= lo and hi < (1 << 63) or 0 <= lo and hi < (1 << 64)
+
+
+def generate(specs: Mapping[str, PortSpec], length: int, seed: int,
+             constraints: Sequence[Constraint]) -> Dict[str, ValueSequence]:
+    """
+    specs: 各端口的随机信号定义
+    length: 信号长度
+    seed: 随机种子
+    constraints: 端口之间的约束, 不满足约束的事件重新生成所有端口的值
+
+    生成随机信号, 相同的种子 (和相同的环境) 生成相同的信号。安装 NumPy 且所有端口都不超过
+    64 位、可选的值均为整数时, 整块生成, 否则逐个生成。x 在约束检查之后注入, 一个值的所有位均为 x
+    """
+    assert length >= 0, "信号长度为负：{}".format(length)
+    if numpy is not None and all([s.vectorized() for s in specs.values()]):
+        return _generateArrays(specs, length, seed, constraints)
+    return _generateLists(specs, length, seed, constraints)
+
+
+def _generateArrays(specs: Mapping[str, PortSpec], length: int, seed: int,
+                    constraints: Sequence[Constraint]) -> Dict[str, ValueSequence]:
+    from .value_array import ValueArray
+
+    rng = numpy.random.default_rng(seed)
+
+    def sample(spec: PortSpec, n: int) -> "numpy.ndarray":
+        d = spec.dist
+        if isinstance(d, Uniform):
+            dtype = numpy.uint64 if d.high >= (1 << 63) else numpy.int64
+            return rng.integers(d.low, d.high, size=n, dtype=dtype,
+                                endpoint=True)
+        p = None
+        if d.weights is not None:
+            p = numpy.array(d.weights, dtype=float)
+            p /= p.sum()
+        values = numpy.array(d.values,
+                             dtype=numpy.uint64 if max(d.values) >=
+                             (1 << 63) else numpy.int64)
+        return values[rng.choice(len(values), size=n, p=p)]
+
+    samples = {p: sample(s, length) for p, s in specs.items()}
+    todo = numpy.arange(length)
+    for _ in range(MAX_REJECT_ROUNDS):
+        if not constraints or not len(todo):
+            break
+        sub = {p: a[todo] for p, a in samples.items()}
+        ok = numpy.ones(len(todo), dtype=bool)
+        for c in constraints:
+            ok &= numpy.broadcast_to(numpy.asarray(c(sub), dtype=bool),
+                                     ok.shape)
+        todo = todo[~ok]
+        for p, s in specs.items():
+            samples[p][todo] = sample(s, len(todo))
+    msg = "{} 轮之后仍有 {} 个值不满足约束".format(MAX_REJECT_ROUNDS, len(todo))
+    assert not constraints or not len(todo), msg
+
+    res: Dict[str, ValueSequence] = {}
+    for p, s in specs.items():
+        a = ValueArray.fromArray(samples[p], s.width, s.signed)
+        if s.xProb > 0:
+            x = rng.random(length) < s.xProb
+            bits = a.valuePlanes.copy()
+            bits[x] = 0
+            xz = numpy.zeros_like(bits)
+            xz[x] = numpy.uint64((1 << s.width) - 1)
+            a = ValueArray(bits, xz, None, s.width, s.signed)
+        res[p] = a
+    return res
+
+
+def _generateLists(specs: Mapping[str, PortSpec], length: int, seed: int,
+                   constraints: Sequence[Constraint]) -> Dict[str, ValueSequence]:
+    rng = random.Random(seed)
+
+    def sample(spec: PortSpec) -> Any:
+        d = spec.dist
+        if isinstance(d, Uniform):
+            return rng.randint(d.low, d.high)
+        if d.weights is None:
+            return rng.choice(d.values)
+        return rng.choices(d.values, d.weights)[0]
+
+    values: Dict[str, List[Value]] = {p: [] for p in specs}
+    xs = {p: Value.fromStr("x", s.width, s.signed) for p, s in specs.items()}
+    for _ in range(length):
+        for _ in range(MAX_REJECT_ROUNDS):
+            row = {p: sample(s) for p, s in specs.items()}
+            if all([c(row) for c in constraints]):
+                break
+        else:
+            assert False, "{} 轮之后仍不满足约束".format(MAX_REJECT_ROUNDS)
+        for p, s in specs.items():
+            if s.xProb > 0 and rng.random() < s.xProb:
+                values[p].append(xs[p])
+            else:
+                values[p].append(Value.fromAny(row[p], s.width, s.signed))
+    return {
+        p: ValueList(values[p], s.width, s.signed)
+        for p, s in specs.items()
+    }
@@ -1,13 +1,44 @@
-from typing import Dict, List, Mapping, Sequence, Tuple, Union
+from typing import (Any, Callable, Dict, Iterator, List, Mapping, Optional,
+                    Sequence, Set, Tuple, Union)
 from pathlib import Path
+import contextlib
+import functools
+import hashlib
+import itertools
+import math
+import re
+import sys
+import time
+import tracemalloc
 
-from vunit import VUnit
+from vunit import VUnit, VUnitCLI, about
+from vunit.sim_if.factory import SIMULATOR_FACTORY
 
-from .event_clock import EventClock
-from .value import Logic, Value
+from .event_clock import ClockPort, EventClock
+from .value import Value
 from .port import Port, PortType, EventClockContainerProtocol
+from .manifest import HashedWriter, Manifest
+from .parallel import runAll
+from .profiling import Profiler
+from .result_cache import ResultCache
+from .sequence import RepeatSequence, ValueList, ValueSequence
+from .stimulus import Constraint, Distribution, PortSpec, generate
 
 PortDef = Union[str, Tuple[str, int]]
+# 检查输出时每块的位数上限
+CHECK_BLOCK_BITS = 1 << 20
+# 生成测试数据时每次写入的字节数
+DUMP_BUFFER_BYTES = 1 << 20
+# 流式输出时每隔多少个事件刷新一次输出文件
+STREAM_FLUSH_ROWS = 1 << 10
+# 仿真中检查输出时, 期望值文件的三个位平面: 期望值 (x/z 为 0), 需要检查的位, 期望为 z 的位
+_EXPECT_TABLE = str.maketrans("xz", "00")
+_CARE_TABLE = str.maketrans("01xz", "1100")
+_ZMASK_TABLE = str.maketrans("01xz", "0001")
+_TIMESCALE_RE = re.compile(r"^\s*(1|10|100)\s*(s|ms|us|ns|ps|fs)\s*/"
+                           r"\s*(1|10|100)\s*(s|ms|us|ns|ps|fs)\s*$")
+# 时间单位对应的 10 的幂次 (以 fs 为 1)
+_TIME_EXPONENTS = {"s": 15, "ms": 12, "us": 9, "ns": 6, "ps": 3, "fs": 0}
 
 
 class Test(EventClockContainerProtocol):
@@ -18,6 +49,7 @@ class Test(EventClockContainerProtocol):
     __testName: str
     __path: Path
     __clocks: Dict[str, EventClock]
+    __clockPorts: Dict[str, ClockPort]
     __inPorts: Dict[str, Port]
     __outPorts: Dict[str, Port]
     __parameters: Dict[str, str]
@@ -25,6 +57,8 @@ class Test(EventClockContainerProtocol):
     __statics: List[str]
     # {clk: [port]}
     __inputs: Dict[str, List[str]]
+    # {clk: [port]}, 输入为周期性序列的端口
+    __patterns: Dict[str, List[str]]
     # {clk: [port]}
     __outputs: Dict[str, List[str]]
     # {clk : max_t}
@@ -32,6 +66,31 @@ class Test(EventClockContainerProtocol):
     # {clk : max_t}
     __outLens: Dict[str, int]
     __reportAllErrors: bool
+    __changesOnly: bool
+    # {clk : 输入数据行数}
+    __inRows: Dict[str, int]
+    __dumpJobs: int
+    __hexData: bool
+    # 需要补充 4 态行的数据文件后缀
+    __patched: Set[str]
+    __manifest: Manifest
+    __streamOutput: bool
+    __selfCheck: bool
+    # 期望值包含 z 的事件时钟
+    __zExpected: Set[str]
+    __timescale: str
+    # 分片数, 每个分片开始时重放的时间长度和分片之前额外重放的时间长度
+    __shards: int
+    __prologue: int
+    __warmup: int
+    # {clk: 报告输出时序号的偏移}, 分片测试中为序号在原测试中的位置
+    __eventShift: Dict[str, int]
+    # 本次生成的所有文件的 SHA-256, 用于仿真结果缓存
+    __digest: str
+    # 记录各阶段的耗时等
+    __profiler: Profiler
+    # 测试在 VUnit 中的名称 (不含配置名), 用于记录
+    __label: str
 
     def __init__(
         self,
@@ -42,6 +101,12 @@ class Test(EventClockContainerProtocol):
         out_ports: Sequence[PortDef] = [],
         parameters: Mapping[str, Union[int, str]] = {},
         report_all_errors: bool = False,
+        changes_only: bool = False,
+        dump_jobs: int = 1,
+        hex_data: bool = True,
+        stream_output: bool = False,
+        self_check: bool = False,
+        timescale: str = "1ns/100ps",
     ):
         """
         module_name: 需要测试的 verilog 模块名
@@ -51,20 +116,58 @@ class Test(EventClockContainerProtocol):
         out_ports: 输出端口定义
         parameters: 模块参数定义
         report_all_errors: 是否报告所有不符合预期的输出, 若否则仅报告最早的输出
+        changes_only: 是否只保存和更新变化的输入, 适用于长时间保持不变的输入
+        dump_jobs: 同时生成测试数据的进程数, 每个事件时钟的输入数据文件在一个 fork 出的
+                   子进程中生成。已在 Test.run 的进程池中生成时 (jobs 大于 1) 不再创建子进程
+        hex_data: 是否以十六进制 ($readmemh) 保存输入数据, 包含 x 或 z 的行另存为二进制,
+                  在读取十六进制数据后覆盖对应的行
+        stream_output: 是否在仿真中逐个事件写入输出文件, 而不是保存在数组中最后写入。
+                       仿真器内存不随测试长度增加, 仿真中断时已写入的输出也会保留
+        self_check: 是否在仿真中检查输出, 只将不符合预期的输出写入文件。
+                    不报告所有错误时, 在第一个不符合预期的输出之后结束仿真
+        timescale: 测试文件的时间单位/精度, 事件时钟和时钟端口的时间均以此为单位
         """
         self.__moduleName = module_name
         self.__testName = test_name
         self.__path = output_path.absolute()
         self.__clocks = {}
+        self.__clockPorts = {}
         self.__inPorts = {}
         self.__outPorts = {}
         self.__parameters = {k: str(v) for k, v in parameters.items()}
         self.__statics = []
         self.__inputs = {}
+        self.__patterns = {}
         self.__outputs = {}
         self.__inLens = {}
         self.__outLens = {}
         self.__reportAllErrors = report_all_errors
+        self.__changesOnly = changes_only
+        self.__inRows = {}
+        assert dump_jobs > 0, "进程数不是正整数：{}".format(dump_jobs)
+        self.__dumpJobs = dump_jobs
+        self.__hexData = hex_data
+        self.__patched = set()
+        self.__manifest = Manifest(self.__genPath(".manifest.json"))
+        self.__streamOutput = stream_output
+        self.__selfCheck = self_check
+        self.__zExpected = set()
+        m = _TIMESCALE_RE.match(timescale)
+        assert m, "时间单位格式错误：{}".format(timescale)
+        unit, precision = [
+            len(n) - 1 + _TIME_EXPONENTS[u]
+            for n, u in (m.group(1, 2), m.group(3, 4))
+        ]
+        assert unit >= precision, "时间精度大于时间单位：{}".format(timescale)
+        self.__timescale = "{}{}/{}{}".format(*m.groups())
+        self.__shards = 1
+        self.__prologue = 0
+        self.__warmup = 0
+        self.__eventShift = {}
+        self.__digest = ""
+        self.__profiler = Profiler()
+        self.__label = "lib.tb_{}_{}.{}".format(module_name, test_name,
+                                                test_name)
 
         def extract(pd: PortDef) -> Tuple[str, int]:
             if isinstance(pd, str):
@@ -128,22 +231,307 @@ class Test(EventClockContainerProtocol):
         else:
             self.__clocks[clk] = EventClock(steps, offset)
 
+    def addClockPort(self,
+                     port: str,
+                     period: int,
+                     duty: float = 0.5,
+                     phase: Optional[int] = None,
+                     until: Optional[int] = None) -> None:
+        """
+        将 1 位输入端口 port 定义为自由运行的时钟
+
+        时钟生成为测试文件中的循环, 不需要数据文件和寄存器数组, 其开销与测试长度无关。
+        参数含义参见 ClockPort
+        """
+        assert port in self.inPorts, "输入端口 {} 未定义".format(port)
+        assert port not in self.__clockPorts, "时钟端口 {} 已定义".format(port)
+        msg = "时钟端口 {} 宽度不为 1：{}".format(port, self.inPorts[port].width)
+        assert self.inPorts[port].width == 1, msg
+        self.__clockPorts[port] = ClockPort(period, duty, phase, until)
+
+    def randomize(self,
+                  length: int,
+                  seed: int,
+                  ports: Mapping[str, Optional[Distribution]],
+                  constraints: Sequence[Constraint] = [],
+                  x_prob: Mapping[str, float] = {}) -> Dict[str, ValueSequence]:
+        """
+        length: 信号长度
+        seed: 随机种子
+        ports: {输入端口: 值的分布}, 分布为 None 时在端口的取值范围内均匀分布
+        constraints: 端口之间的约束, 参数为 {端口: 值}, 参见 stimulus.Constraint
+        x_prob: {输入端口: 每个值为 x 的概率}
+
+        生成随机信号并添加到各输入端口的信号末尾, 返回生成的信号。
+        相同的种子生成相同的信号, 安装 NumPy 时整块生成, 不逐个调用 Python 代码
+        """
+        for p in ports:
+            assert p in self.inPorts, "输入端口 {} 未定义".format(p)
+        for p in x_prob:
+            assert p in ports, "端口 {} 未指定分布".format(p)
+        specs = {
+            p: PortSpec(self.inPorts[p].width, self.inPorts[p].signed, d,
+                        x_prob.get(p, 0.0))
+            for p, d in ports.items()
+        }
+        res = generate(specs, length, seed, constraints)
+        for p, seq in res.items():
+            self.inPorts[p] << seq
+        return res
+
+    def evaluate(self,
+                 model: Callable[..., Any],
+                 inputs: Sequence[str],
+                 outputs: Sequence[str],
+                 chunk_size: int = 1 << 16,
+                 jobs: int = 1,
+                 history: int = 0,
+                 state: Any = None,
+                 arrays: bool = False) -> None:
+        """
+        model: 参考模型, 参数为 {输入端口: 一段输入}, 返回 {输出端口: 对应的一段输出};
+               state 不为 None 时参数为 ({输入端口: 一段输入}, 状态),
+               返回 ({输出端口: 对应的一段输出}, 新状态)
+        inputs: 模型使用的输入端口, 输入长度需要一致
+        outputs: 模型产生的输出端口
+        chunk_size: 每段的输入长度
+        jobs: 进程数, state 不为 None 时各段依次在当前进程中计算
+        history: 每段之前附加的上一段末尾的输入个数, 用于记忆有限的模型 (如 FIR 滤波器),
+                 附加部分对应的输出被丢弃, 各段可以并行计算
+        state: 模型的初始状态, 不为 None 时每段结束时的状态传给下一段
+        arrays: 为 True 时每段输入为整数数组 (参见 ValueArray.ints), 否则为 Value 列表
+
+        分段计算参考模型, 将输出依次添加到各输出端口的输出末尾。每段输出可以是 >> 接受的任意形式,
+        长度需要与该段 (包括附加部分) 的输入长度一致。jobs 大于 1 时模型在 fork 出的子进程中执行,
+        输出需要可序列化
+        """
+        assert inputs, "输入端口为空"
+        assert chunk_size > 0, "分段长度不为正：{}".format(chunk_size)
+        assert history >= 0, "附加输入个数为负：{}".format(history)
+        for p in inputs:
+            assert p in self.inPorts, "输入端口 {} 未定义".format(p)
+        for p in outputs:
+            assert p in self.outPorts, "输出端口 {} 未定义".format(p)
+        length = len(self.inPorts[inputs[0]].input)
+        for p in inputs:
+            msg = "输入端口 {} 长度不一致：{} != {}".format(
+                p, len(self.inPorts[p].input), length)
+            assert len(self.inPorts[p].input) == length, msg
+        bounds = [(s, min(s + chunk_size, length))
+                  for s in range(0, length, chunk_size)]
+
+        def chunk(start: int, stop: int) -> Dict[str, Any]:
+            seqs = {
+                p: self.inPorts[p].input.window(max(0, start - history), stop)
+                for p in inputs
+            }
+            if not arrays:
+                return {p: list(seq) for p, seq in seqs.items()}
+            from .value_array import ValueArray
+            return {
+                p: ValueArray.fromSequence(seq).ints()
+                for p, seq in seqs.items()
+            }
+
+        if state is None:
+            tasks = [
+                functools.partial(lambda s, e: model(chunk(s, e)), s, e)
+                for s, e in bounds
+            ]
+            names = ["[{}, {})".format(s, e) for s, e in bounds]
+            results = runAll(names, tasks, jobs)
+        else:
+            results = []
+            for s, e in bounds:
+                res, state = model(chunk(s, e), state)
+                results.append(res)
+        for (s, e), res in zip(bounds, results):
+            msg = "模型输出端口不一致：{} != {}".format(sorted(res), sorted(outputs))
+            assert set(res) == set(outputs), msg
+            skip = s - max(0, s - history)
+            for p in outputs:
+                seq = self.outPorts[p].normalize(res[p])
+                msg = "模型在 [{}, {}) 的输出 {} 长度不一致：{} != {}".format(
+                    s, e, p, len(seq), e - s + skip)
+                assert len(seq) == e - s + skip, msg
+                self.outPorts[p] >> seq.window(skip, len(seq))
+
+    def shard(self, shards: int, prologue: int = 0, warmup: int = 0) -> None:
+        """
+        shards: 分片数
+        prologue: 每个分片开始时重放的时间长度, 即原测试 (0, prologue] 之内的事件 (如复位过程)
+        warmup: 每个分片在其时间窗口之前额外重放的时间长度, 用于恢复模块的内部状态
+
+        将测试按时间分为多个分片, 在 Test.run 中每个分片生成为一个测试 (测试名后加 _shard序号),
+        由 VUnit 并行仿真。分片边界对齐到所有事件时钟和时钟端口周期的最小公倍数,
+        重放部分的输出不检查。不符合预期的输出按原测试中的序号和时间报告。
+        偏移为正的事件时钟需要在 prologue 之内开始
+        """
+        assert shards > 0, "分片数不是正整数：{}".format(shards)
+        assert prologue >= 0, "重放时间为负：{}".format(prologue)
+        assert warmup >= 0, "重放时间为负：{}".format(warmup)
+        self.__shards = shards
+        self.__prologue = prologue
+        self.__warmup = warmup
+
+    def estimate(self,
+                 max_array_bits: Optional[int] = 1 << 30,
+                 max_file_bytes: Optional[int] = 1 << 30,
+                 max_delays: Optional[int] = 1 << 14,
+                 max_events: Optional[int] = None,
+                 max_done_ts: Optional[int] = None) -> Dict[str, Any]:
+        """
+        max_array_bits: 测试文件中所有数组的总位数上限
+        max_file_bytes: 所有数据文件的总字节数上限
+        max_delays: 每个事件时钟展开的延时语句数上限
+        max_events: 总事件数上限
+        max_done_ts: 测试结束时间上限
+        (为 None 时不限制)
+
+        不生成文件, 也不调用 VUnit, 估算测试的规模, 返回
+          {"clocks": {clk: {"events": 事件数, "delays": 展开的延时语句数,
+                            "arrays": {数组名: 位数}, "files": {数据文件后缀: 字节数},
+                            "exact": 是否为准确值}},
+           "array_bits": 数组总位数, "file_bytes": 数据文件总字节数,
+           "events": 总事件数, "done_ts": 测试结束时间, "warnings": [超出上限的说明]}
+        超出上限时打印警告。数据文件包括输入数据、周期性输入和期望值文件, 以及仿真写回的输出文件;
+        以十六进制保存时不包括包含 x 或 z 的行的补充文件。只保存变化的输入时需要读取输入以计算行数,
+        输入包含迭代器形式的惰性信号时不读取 (否则之后无法生成), 以事件数作为上限, exact 为假
+        """
+        self.__gen()
+
+        def fileBytes(bits: int, rowChars: int, rows: int) -> int:
+            if self.__hexData:
+                return ((bits + 3) // 4 + 1) * rows
+            return (rowChars + 1) * rows
+
+        clocks: Dict[str, Dict[str, Any]] = {}
+        doneTs = 0
+        for clk, c in self.__clocks.items():
+            arrays: Dict[str, int] = {}
+            files: Dict[str, int] = {}
+            exact = True
+            ports = self.__inputs.get(clk, [])
+            duration = self.__inLens.get(clk, 0)
+            if ports:
+                width = sum([self.inPorts[p].width for p in ports])
+                chars = width + len(ports)
+                rows = max([len(self.inPorts[p].input) for p in ports])
+                if self.__changesOnly:
+                    # 迭代器形式的惰性信号只能读取一次, 以事件数作为行数的上限
+                    if all([self.inPorts[p].input.randomAccess for p in ports]):
+                        length = rows
+                        rows = 0
+                        last = ""
+                        for _, _, row in self.__inputRuns(ports, length):
+                            rows += row != last
+                            last = row
+                    else:
+                        exact = False
+                    width += 32
+                    chars += 33
+                arrays["AUTOGEN_{}_input_data".format(clk)] = width * rows
+                files["_{}.in".format(clk)] = fileBytes(width, chars, rows)
+            for p in self.__patterns.get(clk, []):
+                seq = self.inPorts[p].input
+                assert isinstance(seq, RepeatSequence)
+                width = self.inPorts[p].width
+                arrays["AUTOGEN_{}_{}_pattern".format(clk, p)] = width * len(
+                    seq.base)
+                files["_{}_{}.pat".format(clk, p)] = fileBytes(
+                    width, width, len(seq.base))
+            if clk in self.__outputs:
+                duration = self.__outLens[clk]
+                outs = self.__outputs[clk]
+                width = sum([self.outPorts[p].width for p in outs])
+                if self.__selfCheck:
+                    arrays["AUTOGEN_{}_expected".format(clk)] = 3 * width * duration
+                    files["_{}.exp".format(clk)] = fileBytes(
+                        3 * width, 3 * (width + len(outs)), duration)
+                else:
+                    if not self.__streamOutput:
+                        arrays["AUTOGEN_{}_output_data".format(
+                            clk)] = width * duration
+                    files["_{}.out".format(clk)] = (width + 1) * duration
+                doneTs = max(doneTs, c[duration])
+            if not ports and not self.__patterns.get(clk) and \
+                    clk not in self.__outputs:
+                continue
+            # 与 __parts 展开延时语句的方式一致
+            d = duration
+            delays = 0
+            if c.offset < 0:
+                delays += min(len(c.prelude), d)
+                d = max(0, d - len(c.prelude))
+            if d > len(c.steps):
+                delays += len(c.steps) + d % len(c.steps)
+            else:
+                delays += d
+            clocks[clk] = {
+                "events": duration,
+                "delays": delays,
+                "arrays": arrays,
+                "files": files,
+                "exact": exact
+            }
+
+        res: Dict[str, Any] = {
+            "clocks": clocks,
+            "array_bits": sum([sum(c["arrays"].values()) for c in clocks.values()]),
+            "file_bytes": sum([sum(c["files"].values()) for c in clocks.values()]),
+            "events": sum([c["events"] for c in clocks.values()]),
+            "done_ts": doneTs + 1
+        }
+        name = "{}.{}".format(self.__moduleName, self.__testName)
+        warnings: List[str] = []
+        for key, limit in (("array_bits", max_array_bits),
+                           ("file_bytes", max_file_bytes),
+                           ("events", max_events), ("done_ts", max_done_ts)):
+            if limit is not None and res[key] > limit:
+                warnings.append("{} 的 {} 超出上限：{} > {}".format(
+                    name, key, res[key], limit))
+        for clk, c in clocks.items():
+            if max_delays is not None and c["delays"] > max_delays:
+                warnings.append("{} 的事件时钟 {} 展开的延时语句数超出上限：{} > {}".format(
+                    name, clk, c["delays"], max_delays))
+        for w in warnings:
+            print("警告：" + w)
+        res["warnings"] = warnings
+        return res
+
     def hasClock(self, clk: str) -> bool:
         return clk in self.__clocks
 
     def __gen(self) -> None:
         """
-        生成输入/输出序列
+        生成输入/输出序列, 可以重复调用
         """
+        self.__statics = []
+        self.__inputs = {}
+        self.__patterns = {}
+        self.__outputs = {}
+        self.__inLens = {}
+        self.__outLens = {}
         for name, port in self.inPorts.items():
+            if name in self.__clockPorts:
+                msg = "端口 {} 已定义为时钟端口，不能再定义输入或初始值".format(name)
+                assert not port.input and port.initValue is None, msg
+                msg = "端口 {} 已定义为时钟端口，不能依附于事件时钟".format(name)
+                assert not port.clk, msg
+                continue
             if port.input:
                 msg = "端口 {} 定义了输入序列，但是未依附于任何事件时钟".format(name)
                 assert port.clk, msg
                 msg = "端口 {} 所依附的事件时钟不存在：{}".format(name, port.clk)
                 assert port.clk in self.__clocks, msg
-                if port.clk not in self.__inputs:
-                    self.__inputs[port.clk] = []
-                self.__inputs[port.clk].append(name)
+                # 周期性输入只保存一个周期, 不写入输入数据行
+                inputs = self.__inputs
+                if isinstance(port.input,
+                              RepeatSequence) and port.input.count > 1:
+                    inputs = self.__patterns
+                if port.clk not in inputs:
+                    inputs[port.clk] = []
+                inputs[port.clk].append(name)
                 self.__inLens[port.clk] = max(self.__inLens.get(port.clk, 0),
                                               len(port.input))
             elif port.initValue is not None:
@@ -165,9 +553,199 @@ class Test(EventClockContainerProtocol):
         """
         生成测试文件
         """
+        sv = """`timescale {timescale}
+`include "vunit_defines.svh"
+
+module tb_{module}_{test};
+
+logic AUTOGEN_TEST_DONE;
+{reg_define}
+
+initial
+begin
+  AUTOGEN_TEST_DONE = 1'b0;
+{reg_init}
+  fork
+  begin
+    #{done_ts} AUTOGEN_TEST_DONE = 1'b1;
+  end
+{clk_gen}
+  join
+end
+
+{clock_gen}{module}
+  #(
+{param_assign}
+  )
+  uut
+  (
+{port_assign}
+  );
+
+`TEST_SUITE
+begin
+  `TEST_CASE("{test}")
+  begin
+    wait (AUTOGEN_TEST_DONE === 1'b1);
+{data_write}
+  end
+end
+
+endmodule
+""".format(timescale=self.__timescale,
+           module=self.__moduleName,
+           test=self.__testName,
+           **self.__parts())
+
+        with self.__manifest.open(self.__genPath(".sv")) as f:
+            f.write(sv)
+        self.__manifest.save()
+
+    @staticmethod
+    def __writeGroup(name: str, tests: Sequence["Test"], sameSim: bool,
+                     generics: bool) -> Path:
+        """
+        将模块相同的多个测试生成到同一个测试文件 name 中, 返回测试文件路径
+
+        每个测试位于各自的 generate 块中, 有独立的被测模块实例, 在对应的 TEST_CASE
+        设置开始标志后才开始运行, 结束后设置完成标志。sameSim 为真时所有测试在同一次仿真中
+        运行。generics 为真时模块参数为测试文件的参数, 由 VUnit 配置设置, 每个测试的
+        generate 块只在 AUTOGEN_CONFIG 为其参数组合的序号时生成
+        """
+        first = tests[0]
+        configs = Test.__configs(tests) if generics else []
+        flags = ""
+        blocks = ""
+        cases = ""
+        for t in tests:
+            start_name = "AUTOGEN_{}_start".format(t.__testName)
+            finished_name = "AUTOGEN_{}_finished".format(t.__testName)
+            cond = "1"
+            if configs:
+                cond = "AUTOGEN_CONFIG == {}".format(
+                    configs.index(t.__configKey()))
+            flags += "logic {} = 1'b0;\n".format(start_name)
+            flags += "logic {} = 1'b0;\n".format(finished_name)
+            blocks += """if ({cond}) begin : AUTOGEN_{test}
+
+wire AUTOGEN_TEST_START = {start};
+logic AUTOGEN_TEST_DONE;
+{reg_define}
+
+initial
+begin
+  AUTOGEN_TEST_DONE = 1'b0;
+  wait (AUTOGEN_TEST_START === 1'b1);
+{reg_init}
+  fork
+  begin
+    #{done_ts} AUTOGEN_TEST_DONE = 1'b1;
+  end
+{clk_gen}
+  join
+end
+
+initial
+begin
+  wait (AUTOGEN_TEST_DONE === 1'b1);
+{data_write}
+  {finished} = 1'b1;
+end
+
+{clock_gen}{module}
+  #(
+{param_assign}
+  )
+  uut
+  (
+{port_assign}
+  );
+
+end
+
+""".format(cond=cond,
+           test=t.__testName,
+           start=start_name,
+           finished=finished_name,
+           module=t.__moduleName,
+           **t.__parts(True, bool(configs)))
+            case = "    {} = 1'b1;\n".format(start_name)
+            case += "    wait ({} === 1'b1);\n".format(finished_name)
+            cases += """  `TEST_CASE("{test}")
+  begin
+{case}  end
+""".format(test=t.__testName, case=case)
+
+        params = ""
+        if configs:
+            params += "parameter AUTOGEN_CONFIG = 0;\n"
+            for k, v in configs[0]:
+                params += "parameter {} = {};\n".format(k, v)
+            params += "\n"
+
+        sv = """`timescale {timescale}
+`include "vunit_defines.svh"
+{pragma}
+module {name};
+
+{params}{flags}
+{blocks}`TEST_SUITE
+begin
+{cases}end
+
+endmodule
+""".format(timescale=first.__timescale,
+           pragma="// vunit: run_all_in_same_sim\n" if sameSim else "",
+           name=name,
+           params=params,
+           flags=flags,
+           blocks=blocks,
+           cases=cases)
+
+        path = first.__path / (name + ".sv")
+        with first.__manifest.open(path) as f:
+            f.write(sv)
+        first.__manifest.save()
+        return path
+
+    def __configKey(self) -> Tuple[Tuple[str, str], ...]:
+        """
+        按参数名排序的参数组合
+        """
+        return tuple(sorted(self.__parameters.items()))
+
+    @staticmethod
+    def __configs(tests: Sequence["Test"]) -> List[Tuple[Tuple[str, str], ...]]:
+        """
+        按测试的顺序列出不同的参数组合, 其序号即 AUTOGEN_CONFIG
+        """
+        res: List[Tuple[Tuple[str, str], ...]] = []
+        for t in tests:
+            if t.__configKey() not in res:
+                res.append(t.__configKey())
+        return res
+
+    @staticmethod
+    def __configName(config: Tuple[Tuple[str, str], ...]) -> str:
+        """
+        参数组合对应的 VUnit 配置名
+        """
+        return ",".join(["{}={}".format(k, v) for k, v in config])
+
+    def __parts(self,
+                grouped: bool = False,
+                generics: bool = False) -> Dict[str, str]:
+        """
+        生成测试文件的各个部分
+
+        grouped: 是否与其他测试生成到同一个测试文件中, 此时时钟端口在测试开始后才开始翻转,
+                 在测试结束后停止
+        generics: 模块参数是否为测试文件的同名参数
+        """
         reg_define = ""
         reg_init = ""
         clk_gen = ""
+        clock_gen = ""
         port_assign = ""
         param_assign = ""
         data_write = ""
@@ -181,6 +759,29 @@ class Test(EventClockContainerProtocol):
             port_assign += "    .{}({}[{}:{}]),\n".format(
                 p, input_name, 0, port.width - 1)
 
+        for p, cp in self.__clockPorts.items():
+            clock_name = "AUTOGEN_clock_{}".format(p)
+            reg_define += "logic {};\n".format(clock_name)
+            port_assign += "    .{}({}),\n".format(p, clock_name)
+            clock_gen += "initial\nbegin\n"
+            clock_gen += "  {} = 1'b0;\n".format(clock_name)
+            if grouped:
+                clock_gen += "  wait (AUTOGEN_TEST_START === 1'b1);\n"
+            if cp.phase > 0:
+                clock_gen += "  #{};\n".format(cp.phase)
+            if cp.cycles is None and grouped:
+                clock_gen += "  while (AUTOGEN_TEST_DONE !== 1'b1)\n"
+            elif cp.cycles is None:
+                clock_gen += "  forever\n"
+            else:
+                clock_gen += "  repeat ({})\n".format(cp.cycles)
+            clock_gen += "  begin\n"
+            clock_gen += "    {} = 1'b1;\n".format(clock_name)
+            clock_gen += "    #{} {} = 1'b0;\n".format(cp.high, clock_name)
+            clock_gen += "    #{};\n".format(cp.low)
+            clock_gen += "  end\n"
+            clock_gen += "end\n\n"
+
         for clk, c in self.__clocks.items():
             cnt_name = "AUTOGEN_{}_cnt".format(clk)
             input_name = "AUTOGEN_{}_input".format(clk)
@@ -194,13 +795,18 @@ class Test(EventClockContainerProtocol):
             reg_define += "integer {};\n".format(cnt_name)
             duration = 0
 
-            if clk in self.__inputs:
+            ports = self.__inputs.get(clk, [])
+            patterns = self.__patterns.get(clk, [])
+            if ports or patterns:
                 assert clk in self.__inLens
                 duration = self.__inLens[clk]
                 start = 0
                 initValueStr = ""
-                for p in self.__inputs[clk]:
+                # {port: 在输入中的起始位置}
+                starts: Dict[str, int] = {}
+                for p in ports + patterns:
                     port = self.inPorts[p]
+                    starts[p] = start
                     port_assign += "    .{}({}[{}:{}]),\n".format(
                         p, input_name, start, start + port.width - 1)
                     if port.initValue is not None:
@@ -210,17 +816,66 @@ class Test(EventClockContainerProtocol):
                     start += port.width
 
                 reg_define += "logic[0:{}] {};\n".format(start - 1, input_name)
-                reg_define += "logic[0:{}] {}[0:{}];\n".format(
-                    start - 1, input_data_name, duration - 1)
                 reg_init += "  {} = {}'b{};\n".format(input_name, start,
                                                       initValueStr)
-                reg_init += "  $readmemb(\"{}\", {});\n".format(
-                    self.__genEscapedPath("_" + clk + ".in"), input_data_name)
+                # 数据行对应的输入位置, 周期性输入排在最后
+                target = input_name
+                if patterns:
+                    start = starts[patterns[0]]
+                    target = "{}[0:{}]".format(input_name, start - 1)
+
+            if ports:
+                if self.__changesOnly:
+                    # 每行的前 32 位为事件序号, 只在序号到达时更新输入
+                    rows = self.__inRows[clk]
+                    ptr_name = "AUTOGEN_{}_ptr".format(clk)
+                    reg_define += "integer {};\n".format(ptr_name)
+                    reg_define += "logic[0:{}] {}[0:{}];\n".format(
+                        start + 31, input_data_name, rows - 1)
+                    reg_init += "  {} = 0;\n".format(ptr_name)
+                    step_action += ("        if ({0} < {1} && "
+                                    "{2}[{0}][0:31] == {3})\n").format(
+                                        ptr_name, rows, input_data_name,
+                                        cnt_name)
+                    step_action += "        begin\n"
+                    step_action += "          {} = {}[{}][32:{}];\n".format(
+                        target, input_data_name, ptr_name, start + 31)
+                    step_action += "          {0} = {0} + 1;\n".format(ptr_name)
+                    step_action += "        end\n"
+                else:
+                    rows = self.__inRows[clk]
+                    reg_define += "logic[0:{}] {}[0:{}];\n".format(
+                        start - 1, input_data_name, rows - 1)
+                    step_action += "        if ({} < {})\n".format(
+                        cnt_name, rows)
+                    step_action += "        begin\n"
+                    step_action += "          {} = {}[{}];\n".format(
+                        target, input_data_name, cnt_name)
+                    step_action += "        end\n"
+                reg_init += self.__readmem("_" + clk + ".in", input_data_name)
+
+            for p in patterns:
+                # 只保存一个周期, 用循环序号读取
+                port = self.inPorts[p]
+                seq = port.input
+                assert isinstance(seq, RepeatSequence)
+                period = len(seq.base)
+                pattern_name = "AUTOGEN_{}_{}_pattern".format(clk, p)
+                idx_name = "AUTOGEN_{}_{}_idx".format(clk, p)
+                reg_define += "logic[0:{}] {}[0:{}];\n".format(
+                    port.width - 1, pattern_name, period - 1)
+                reg_define += "integer {};\n".format(idx_name)
+                reg_init += "  {} = 0;\n".format(idx_name)
+                reg_init += self.__readmem("_" + clk + "_" + p + ".pat",
+                                           pattern_name)
                 step_action += "        if ({} < {})\n".format(
-                    cnt_name, duration)
+                    cnt_name, len(seq))
                 step_action += "        begin\n"
-                step_action += "          {} = {}[{}];\n".format(
-                    input_name, input_data_name, cnt_name)
+                step_action += "          {}[{}:{}] = {}[{}];\n".format(
+                    input_name, starts[p], starts[p] + port.width - 1,
+                    pattern_name, idx_name)
+                step_action += ("          {0} = {0} == {1} ? 0 : {0} + 1;\n"
+                                ).format(idx_name, period - 1)
                 step_action += "        end\n"
 
             if clk in self.__outputs:
@@ -234,13 +889,28 @@ class Test(EventClockContainerProtocol):
                     start += port.width
 
                 reg_define += "wire[0:{}] {};\n".format(start - 1, output_name)
-                reg_define += "logic[0:{}] {}[0:{}];\n".format(
-                    start - 1, output_data_name, duration - 1)
                 step_action += "        if ({} < {})\n".format(
                     cnt_name, duration)
                 step_action += "        begin\n"
-                step_action += "          {}[{}] = {};\n".format(
-                    output_data_name, cnt_name, output_name)
+                if self.__selfCheck:
+                    reg_define, reg_init, step_action = self.__writeSelfCheck(
+                        clk, start, duration, reg_define, reg_init,
+                        step_action)
+                elif self.__streamOutput:
+                    fd_name = "AUTOGEN_{}_output_fd".format(clk)
+                    reg_define += "integer {};\n".format(fd_name)
+                    reg_init += "  {} = $fopen(\"{}\", \"w\");\n".format(
+                        fd_name, self.__genEscapedPath("_" + clk + ".out"))
+                    step_action += "          $fwrite({}, \"%b\\n\", {});\n".format(
+                        fd_name, output_name)
+                    step_action += "          if ({} % {} == {})\n".format(
+                        cnt_name, STREAM_FLUSH_ROWS, STREAM_FLUSH_ROWS - 1)
+                    step_action += "            $fflush({});\n".format(fd_name)
+                else:
+                    reg_define += "logic[0:{}] {}[0:{}];\n".format(
+                        start - 1, output_data_name, duration - 1)
+                    step_action += "          {}[{}] = {};\n".format(
+                        output_data_name, cnt_name, output_name)
                 step_action += "        end\n"
                 maxTs = max(maxTs, c[duration])
 
@@ -269,85 +939,254 @@ class Test(EventClockContainerProtocol):
             clk_gen += "    begin\n{}    end\n".format(clk_action)
 
         for clk in self.__outputs:
+            if self.__selfCheck:
+                data_write += ("    $fwrite(AUTOGEN_{0}_mismatch_fd, "
+                               "\"done %0d\\n\", AUTOGEN_{0}_cnt);\n").format(clk)
+                data_write += "    $fclose(AUTOGEN_{}_mismatch_fd);\n".format(
+                    clk)
+                continue
+            if self.__streamOutput:
+                data_write += "    $fclose(AUTOGEN_{}_output_fd);\n".format(clk)
+                continue
             data_name = "AUTOGEN_{}_output_data".format(clk)
             data_write += "    $writememb(\"{}\", {});\n".format(
                 self.__genEscapedPath("_" + clk + ".out"), data_name)
 
         for k, v in self.__parameters.items():
-            param_assign += "    .{}({}),\n".format(k, v)
+            param_assign += "    .{}({}),\n".format(k, k if generics else v)
 
-        sv = """`timescale 1ns/100ps
-`include "vunit_defines.svh"
+        return {
+            "reg_define": reg_define[:-1],
+            "reg_init": reg_init[:-1],
+            "done_ts": str(maxTs + 1),
+            "clk_gen": clk_gen[:-1],
+            "clock_gen": clock_gen,
+            "param_assign": param_assign[:-2],
+            "port_assign": port_assign[:-2],
+            "data_write": data_write[:-1]
+        }
 
-module tb_{module}_{test};
+    def __writeSelfCheck(self, clk: str, width: int, duration: int,
+                         reg_define: str, reg_init: str,
+                         step_action: str) -> Tuple[str, str, str]:
+        """
+        生成在仿真中检查事件时钟 clk 的输出的定义、初始化和事件动作
 
-logic AUTOGEN_TEST_DONE;
-{reg_define}
+        输出与期望值异或后与需要检查的位相与, 结果不为 0 时不符合预期; 期望为 z 的位逐位用
+        !== 检查。不符合预期的输出以 "序号 输出" 的形式写入文件
+        """
+        w = width
+        output_name = "AUTOGEN_{}_output".format(clk)
+        expected_name = "AUTOGEN_{}_expected".format(clk)
+        exp_name = "AUTOGEN_{}_exp".format(clk)
+        bad_name = "AUTOGEN_{}_bad".format(clk)
+        fd_name = "AUTOGEN_{}_mismatch_fd".format(clk)
+        cnt_name = "AUTOGEN_{}_cnt".format(clk)
+        reg_define += "bit[0:{}] {}[0:{}];\n".format(3 * w - 1, expected_name,
+                                                     duration - 1)
+        reg_define += "bit[0:{}] {};\n".format(3 * w - 1, exp_name)
+        reg_define += "logic {};\n".format(bad_name)
+        reg_define += "integer {};\n".format(fd_name)
+        reg_init += self.__readmem("_" + clk + ".exp", expected_name)
+        reg_init += "  {} = $fopen(\"{}\", \"w\");\n".format(
+            fd_name, self.__genEscapedPath("_" + clk + ".mis"))
+        step_action += "          {} = {}[{}];\n".format(
+            exp_name, expected_name, cnt_name)
+        step_action += ("          {} = (({} ^ {}[0:{}]) & {}[{}:{}]) !== 0;\n"
+                        ).format(bad_name, output_name, exp_name, w - 1,
+                                 exp_name, w, 2 * w - 1)
+        if clk in self.__zExpected:
+            i_name = "AUTOGEN_{}_i".format(clk)
+            reg_define += "integer {};\n".format(i_name)
+            step_action += "          if ({}[{}:{}] != 0)\n".format(
+                exp_name, 2 * w, 3 * w - 1)
+            step_action += ("            for ({0} = 0; {0} < {1}; {0} = {0} + 1)\n"
+                            ).format(i_name, w)
+            step_action += ("              if ({0}[{1} + {2}] && {3}[{2}] !== 1'bz)\n"
+                            ).format(exp_name, 2 * w, i_name, output_name)
+            step_action += "                {} = 1'b1;\n".format(bad_name)
+        step_action += "          if ({})\n".format(bad_name)
+        step_action += "          begin\n"
+        step_action += "            $fwrite({}, \"%0d %b\\n\", {}, {});\n".format(
+            fd_name, cnt_name, output_name)
+        if not self.__reportAllErrors:
+            step_action += "            AUTOGEN_TEST_DONE <= 1'b1;\n"
+        step_action += "          end\n"
+        return reg_define, reg_init, step_action
 
-initial
-begin
-  AUTOGEN_TEST_DONE = 1'b0;
-{reg_init}
-  fork
-  begin
-    #{done_ts} AUTOGEN_TEST_DONE = 1'b1;
-  end
-{clk_gen}
-  join
-end
+    def __dump(self) -> bool:
+        """
+        生成测试数据
 
-{module}
-  #(
-{param_assign}
-  )
-  uut
-  (
-{port_assign}
-  );
+        只保存变化的输入时, 仅写入与上一行不同的行, 每行之前为 32 位的事件序号。
+        周期性输入的每个端口单独写入一个周期
+        """
+        clks = list(self.__inputs)
+        tasks = [functools.partial(self.__dumpClock, clk) for clk in clks]
+        for clk, (rows, manifest, patched) in zip(
+                clks, runAll(clks, tasks, self.__dumpJobs)):
+            self.__inRows[clk] = rows
+            self.__manifest.merge(manifest)
+            if patched:
+                self.__patched.add("_" + clk + ".in")
+            else:
+                self.__patched.discard("_" + clk + ".in")
+        for clk, ports in self.__patterns.items():
+            for p in ports:
+                seq = self.inPorts[p].input
+                assert isinstance(seq, RepeatSequence)
+                with self.__dataWriter("_" + clk + "_" + p + ".pat") as write:
+                    for row, n in seq.base.stringRuns():
+                        write(row, n)
+        if self.__selfCheck:
+            for clk, ports in self.__outputs.items():
+                self.__dumpExpected(clk, ports)
+        return True
 
-`TEST_SUITE
-begin
-  `TEST_CASE("{test}")
-  begin
-    while(1) begin
-      #1 if (AUTOGEN_TEST_DONE) begin
-        break;
-      end
-    end
-{data_write}
-  end
-end
+    def __dumpExpected(self, clk: str, ports: Sequence[str]) -> None:
+        """
+        生成事件时钟 clk 的期望值文件, 每行依次为期望值、需要检查的位和期望为 z 的位
 
-endmodule
-""".format(module=self.__moduleName,
-           reg_define=reg_define[:-1],
-           reg_init=reg_init[:-1],
-           done_ts=maxTs + 1,
-           clk_gen=clk_gen[:-1],
-           param_assign=param_assign[:-2],
-           port_assign=port_assign[:-2],
-           test=self.__testName,
-           data_write=data_write[:-1])
+        期望序列较短的端口以 x 补齐, 即不检查
+        """
+        columns = [
+            itertools.chain(self.outPorts[p].output.stringRuns(),
+                            [("x" * self.outPorts[p].width, self.__outLens[clk])])
+            for p in ports
+        ]
+        self.__zExpected.discard(clk)
+        with self.__dataWriter("_" + clk + ".exp") as write:
+            for _, n, row in self.__rowRuns(columns, self.__outLens[clk]):
+                if "z" in row:
+                    self.__zExpected.add(clk)
+                write(
+                    row.translate(_EXPECT_TABLE) + row.translate(_CARE_TABLE) +
+                    row.translate(_ZMASK_TABLE), n)
 
-        with open(self.__genPath(".sv"), "w") as f:
-            f.write(sv)
+    def __dumpClock(self, clk: str) -> Tuple[int, Manifest, bool]:
+        """
+        生成事件时钟 clk 的输入数据文件, 返回 (写入的行数, 记录写入文件的清单, 是否有补充文件)
 
-    def __dump(self) -> bool:
+        可能在子进程中执行, 写入的文件记录在由 branch 生成的清单中, 由 __dump 合并
         """
-        生成测试数据
+        ports = self.__inputs[clk]
+        length = max([len(self.inPorts[p].input) for p in ports])
+        rows = 0
+        last = ""
+        suffix = "_" + clk + ".in"
+        manifest = self.__manifest.branch()
+        with self.__dataWriter(suffix, manifest) as write:
+            for t, n, row in self.__inputRuns(ports, length):
+                if self.__changesOnly:
+                    if row == last:
+                        continue
+                    row = "{:032b}_{}".format(t, row)
+                    n = 1
+                    last = row[33:]
+                write(row, n)
+                rows += n
+        return rows, manifest, suffix in self.__patched
+
+    @contextlib.contextmanager
+    def __dataWriter(
+            self,
+            suffix: str,
+            manifest: Optional[Manifest] = None
+    ) -> Iterator[Callable[[str, int], None]]:
         """
-        for clk, ports in self.__inputs.items():
-            with open(self.__genPath("_" + clk + ".in"), "w") as f:
-                for t in range(self.__inLens[clk]):
-                    for p in ports:
-                        port = self.inPorts[p]
-                        if t < len(port.input):
-                            f.write(str(port.input[t]))
-                        else:
-                            f.write(str(port.input[-1]))
-                        f.write("_")
-                    f.write("\n")
-        return True
+        打开数据文件, 生成写入函数 write(行, 重复次数), 写入的文件记录在 manifest
+        (默认为测试的清单) 中
+
+        各行先在内存中拼接, 每满 DUMP_BUFFER_BYTES 字节写入一次。以十六进制保存时,
+        包含 x 或 z 的行在十六进制文件中以 0 占位, 并以 "@地址" 加二进制行的形式
+        写入补充文件
+        """
+        m = self.__manifest if manifest is None else manifest
+        rows = 0
+        buf: List[str] = []
+        size = 0
+        patch: Optional[HashedWriter] = None
+        # 补充文件中下一行的地址, 连续的行不需要重复写入地址
+        patchNext = -1
+
+        def write(row: str, n: int) -> None:
+            nonlocal rows, buf, size, patch, patchNext
+            line = row + "\n"
+            if self.__hexData:
+                bits = row.replace("_", "")
+                digits = (len(bits) + 3) // 4
+                if "x" in bits or "z" in bits:
+                    if patch is None:
+                        patch = stack.enter_context(
+                            m.open(self.__genPath(suffix + ".xz")))
+                    if rows != patchNext:
+                        patch.write("@{:x}\n".format(rows))
+                    patch.write(line * n)
+                    patchNext = rows + n
+                    line = "0" * digits + "\n"
+                else:
+                    line = format(int(bits, 2), "0{}x".format(digits)) + "\n"
+            rows += n
+            while n > 0:
+                k = min(n, max(1, (DUMP_BUFFER_BYTES - size) // len(line)))
+                buf.append(line * k if k > 1 else line)
+                size += len(line) * k
+                n -= k
+                if size >= DUMP_BUFFER_BYTES:
+                    f.write("".join(buf))
+                    buf = []
+                    size = 0
+
+        with contextlib.ExitStack() as stack:
+            f = stack.enter_context(m.open(self.__genPath(suffix)))
+            yield write
+            f.write("".join(buf))
+        if patch is not None:
+            self.__patched.add(suffix)
+        else:
+            self.__patched.discard(suffix)
+
+    def __readmem(self, suffix: str, name: str) -> str:
+        """
+        生成将数据文件读入数组 name 的语句
+        """
+        if not self.__hexData:
+            return "  $readmemb(\"{}\", {});\n".format(
+                self.__genEscapedPath(suffix), name)
+        res = "  $readmemh(\"{}\", {});\n".format(self.__genEscapedPath(suffix),
+                                                name)
+        if suffix in self.__patched:
+            res += "  $readmemb(\"{}\", {});\n".format(
+                self.__genEscapedPath(suffix + ".xz"), name)
+        return res
+
+    def __inputRuns(self, ports: Sequence[str],
+                    n: int) -> Iterator[Tuple[int, int, str]]:
+        """
+        按顺序生成前 n 个事件的输入 (起始序号, 连续重复次数, 行)
+
+        行由各端口的值加 "_" 拼接而成, 序列较短的端口保持最后一个值
+        """
+        return self.__rowRuns([self.inPorts[p].input.stringRuns() for p in ports],
+                              n)
+
+    @staticmethod
+    def __rowRuns(columns: List[Iterator[Tuple[str, int]]],
+                  n: int) -> Iterator[Tuple[int, int, str]]:
+        """
+        合并各列的 (字符串, 连续重复次数), 按顺序生成前 n 行 (起始序号, 连续重复次数, 行)
+
+        行由各列的字符串加 "_" 拼接而成, 较短的列保持最后一个字符串
+        """
+        heads = [next(c) for c in columns]
+        t = 0
+        while t < n:
+            step = min([k for _, k in heads] + [n - t])
+            yield t, step, "".join([s + "_" for s, _ in heads])
+            t += step
+            for i, (s, k) in enumerate(heads):
+                heads[i] = (s, k - step) if k > step else next(
+                    columns[i], (s, n))
 
     def __genPath(self, suffix: str) -> Path:
         """
@@ -364,6 +1203,18 @@ endmodule
 
     # 此函数不能有类型，否则 VUnit 不工作
     def __check(self):
+        """
+        读取并检查输出, 记录检查阶段
+        """
+        with self.__profiler.phase(self.__label, "check") as m:
+            suffix = ".mis" if self.__selfCheck else ".out"
+            paths = [self.__genPath("_" + clk + suffix) for clk in self.__outputs]
+            m["bytes_read"] = sum([p.stat().st_size for p in paths if p.exists()])
+            m["samples"] = sum(
+                [len(self.outPorts[p].output) for p in self.outPorts])
+            return self.__checkOutputs()
+
+    def __checkOutputs(self) -> bool:
         """
         读取并检查输出
         """
@@ -384,53 +1235,159 @@ endmodule
                 msg += ">> {w}'b{s}\n".format(w=value.width, s=value)
             return msg
 
-        def checkEq(value: Value, expected: Value) -> bool:
-            if value.width != expected.width:
-                return False
-            for i, v in enumerate(expected):
-                if v == Logic.X:
-                    continue
-                if value[i] != v:
-                    return False
-            return True
-
-        ret = True
-        msgs = {}
+        # {ts: [(port, t, actual, expected)]}
+        mismatches: Dict[int, List[Tuple[str, int, str, str]]] = {}
+        found: Dict[str, List[Tuple[str, int, str, str]]] = {}
+        if self.__selfCheck:
+            found = self.__readMismatches()
         for clk, ports in self.__outputs.items():
-            values = []
-            width = sum([self.outPorts[p].width for p in ports])
-            with open(self.__genPath("_" + clk + ".out"), "r") as f:
-                lines = f.readlines()
-                values = [
-                    Value.fromStr(line.strip(), width, False) for line in lines
-                    if line[0] != "/"
+            if not self.__selfCheck:
+                found[clk] = self.__compare(clk, ports)
+            for p, t, actual, expected in found[clk]:
+                t += self.__eventShift.get(clk, 0)
+                ts = self.__clocks[clk][t]
+                if ts not in mismatches:
+                    mismatches[ts] = []
+                mismatches[ts].append((p, t, actual, expected))
+
+        reported = sorted(mismatches)
+        if not self.__reportAllErrors:
+            reported = reported[:1]
+        for ts in reported:
+            for p, t, actual, expected in mismatches[ts]:
+                port = self.outPorts[p]
+                print(
+                    diffMsg(p, t, ts,
+                            Value.fromStr(actual, port.width, False),
+                            Value.fromStr(expected, port.width, port.signed)))
+        return not mismatches
+
+    def __readMismatches(self) -> Dict[str, List[Tuple[str, int, str, str]]]:
+        """
+        读取仿真中检查输出时写入的所有事件时钟的不匹配输出,
+        返回 {事件时钟: [(端口, 序号, 实际值, 期望值)]}
+
+        期望值从期望值文件中读取, 不再读取端口的期望序列。文件最后一行为
+        "done 事件数", 缺少该行或事件数不足说明仿真没有正常结束。不报告所有错误时,
+        任一事件时钟的不匹配都会结束整个仿真, 此时其他事件时钟的事件数不足不是错误
+        """
+        found: Dict[str, Tuple[List[Tuple[int, str]], Optional[int]]] = {}
+        for clk in self.__outputs:
+            rows: List[Tuple[int, str]] = []
+            done = None
+            with open(self.__genPath("_" + clk + ".mis"), "r") as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) != 2:
+                        continue
+                    if fields[0] == "done":
+                        done = int(fields[1])
+                    else:
+                        rows.append((int(fields[0]), fields[1]))
+            found[clk] = (rows, done)
+        stopped = not self.__reportAllErrors and any(
+            [rows for rows, _ in found.values()])
+        res: Dict[str, List[Tuple[str, int, str, str]]] = {}
+        for clk, (rows, done) in found.items():
+            if not stopped:
+                msg = "仿真没有正常结束：事件时钟 {}".format(clk)
+                assert done is not None, msg
+                n = self.__outLens[clk]
+                msg = "仿真提前结束：事件时钟 {} 只有 {} 个事件，应为 {}".format(
+                    clk, done, n)
+                assert rows or done >= n, msg
+            res[clk] = self.__expectedMismatches(clk, self.__outputs[clk],
+                                                 rows)
+        return res
+
+    def __expectedMismatches(
+            self, clk: str, ports: Sequence[str],
+            rows: List[Tuple[int, str]]) -> List[Tuple[str, int, str, str]]:
+        """
+        从期望值文件中读取不匹配输出 rows [(序号, 输出)] 的期望值,
+        返回 (端口, 序号, 实际值, 期望值)
+        """
+        widths = [self.outPorts[p].width for p in ports]
+        width = sum(widths)
+        starts = [sum(widths[:i]) for i in range(len(widths))]
+        res: List[Tuple[str, int, str, str]] = []
+        with open(self.__genPath("_" + clk + ".exp"), "r") as f:
+            lines = (line.strip() for line in f)
+            lines = (line for line in lines if line and line[0] not in "/@")
+            last = 0
+            for t, actual in sorted(rows):
+                line = next(itertools.islice(lines, t - last, None))
+                last = t + 1
+                if self.__hexData:
+                    bits = format(int(line, 16), "0{}b".format(3 * width))
+                else:
+                    bits = line.replace("_", "")
+                bits = bits[-3 * width:]
+                expected = "".join([
+                    "z" if zm == "1" else "x" if c == "0" else e for e, c, zm in
+                    zip(bits[:width], bits[width:2 * width], bits[2 * width:])
+                ])
+                for p, s, w in zip(ports, starts, widths):
+                    a = actual[s:s + w]
+                    e = expected[s:s + w]
+                    aBits, aXz, aZ = Value.planesFromStr(a)
+                    eBits, eXz, eZ = Value.planesFromStr(e)
+                    if ((aBits ^ eBits) | (aXz ^ eXz) |
+                        (aZ ^ eZ)) & ~(eXz & ~eZ):
+                        res.append((p, t, a, e))
+        return res
+
+    def __compare(self, clk: str,
+                  ports: Sequence[str]) -> List[Tuple[str, int, str, str]]:
+        """
+        比较事件时钟 clk 的输出文件和期望输出, 返回不匹配的 (端口, 序号, 实际值, 期望值)
+
+        每次读取一块输出, 将实际值和期望值分别转换为整块的位平面, 用整数的异或/与运算
+        一次比较整块中的所有端口和所有事件。期望值为 x 的位不检查, 为 z 的位要求实际值也为 z。
+        不报告所有错误时, 在第一个不匹配的事件之后停止
+        """
+        widths = [self.outPorts[p].width for p in ports]
+        width = sum(widths)
+        starts = [sum(widths[:i]) for i in range(len(widths))]
+        n = self.__outLens[clk]
+        block = max(1, CHECK_BLOCK_BITS // width)
+        expected = [self.outPorts[p].output.strings() for p in ports]
+        lens = [len(self.outPorts[p].output) for p in ports]
+        res: List[Tuple[str, int, str, str]] = []
+        with open(self.__genPath("_" + clk + ".out"), "r") as f:
+            lines = (line.strip() for line in f)
+            lines = (line for line in lines if line and line[0] != "/")
+            for t0 in range(0, n, block):
+                rows = list(itertools.islice(lines, min(block, n - t0)))
+                assert len(rows) == min(block, n - t0), "文件长度不足"
+                assert all([len(r) == width
+                            for r in rows]), "值的宽度不匹配：{}".format(width)
+                columns = [
+                    list(itertools.islice(e, max(0, min(len(rows), l - t0))))
+                    for e, l in zip(expected, lens)
                 ]
-            assert len(values) >= self.__outLens[clk], "文件长度不足"
-            for t in range(self.__outLens[clk]):
-                start = 0
-                for p in ports:
-                    port = self.outPorts[p]
-                    if t < len(port.output):
-                        if not checkEq(values[t][start:start + port.width],
-                                       port.output[t]):
-                            ts = self.__clocks[clk][t]
-                            if ts not in msgs:
-                                msgs[ts] = []
-                            msgs[ts].append(
-                                diffMsg(p, t, ts,
-                                        values[t][start:start + port.width],
-                                        port.output[t]))
-                            ret = False
-                    start += port.width
-        if self.__reportAllErrors:
-            for t, ms in sorted(msgs.items(), key=lambda x: x[0]):
-                for m in ms:
-                    print(m)
-        elif msgs:
-            ts = sorted(msgs)[0]
-            for m in msgs[ts]:
-                print(m)
-        return ret
+                for c, w in zip(columns, widths):
+                    c += ["x" * w] * (len(rows) - len(c))
+                actualText = "".join(rows)
+                expectedText = "".join(map("".join, zip(*columns)))
+                bits, xz, z = Value.planesFromStr(actualText)
+                eBits, eXz, eZ = Value.planesFromStr(expectedText)
+                diff = ((bits ^ eBits) | (xz ^ eXz) | (z ^ eZ)) & ~(eXz & ~eZ)
+                if not diff:
+                    continue
+                d = format(diff, "0{}b".format(len(actualText)))
+                i = d.find("1")
+                while i >= 0:
+                    r = i // width
+                    for p, s, w in zip(ports, starts, widths):
+                        a = r * width + s
+                        if "1" in d[a:a + w]:
+                            res.append((p, t0 + r, actualText[a:a + w],
+                                        expectedText[a:a + w]))
+                    if not self.__reportAllErrors:
+                        return res
+                    i = d.find("1", (r + 1) * width)
+        return res
 
     @staticmethod
     def run(
@@ -440,13 +1397,66 @@ endmodule
         auto_dependency: bool = False,
         include_dirs: Sequence[Path] = [],
         external_libraries: Mapping[str, Path] = {},
+        group_tests: bool = False,
+        same_sim: bool = False,
+        parameter_generics: bool = False,
+        jobs: int = 1,
+        result_cache: Optional[Path] = None,
+        result_cache_size: int = 1000,
+        profile: Optional[Path] = None,
+        dry_run: bool = False,
+        budgets: Mapping[str, Optional[int]] = {},
     ) -> None:
+        """
+        tests: 测试单元
+        dependencies: 被测模块的源文件, 或 (源文件, 宏定义)
+        auto_dependency: 是否由 VUnit 自动分析源文件之间的依赖关系, 若否则按顺序编译
+        include_dirs: 头文件路径
+        external_libraries: 外部库 {库名: 路径}
+        group_tests: 是否将模块、参数和时间单位相同的测试生成到同一个测试文件中,
+                     每个测试为其中的一个 TEST_CASE, 减少编译次数
+        same_sim: 是否在同一次仿真中运行同一个测试文件中的所有测试, 需要 group_tests。
+                  与 parameter_generics 同时使用且测试文件有多种参数组合时, 各测试单独仿真
+        parameter_generics: 是否将模块参数作为测试文件的参数, 每种参数组合为一个 VUnit 配置,
+                            参数名相同的测试共用一个测试文件, 需要 group_tests。
+                            参数值需要是仿真器可以从命令行设置的常量
+        jobs: 生成测试数据和测试文件的进程数, 按测试 (或测试文件) 分配到各个进程
+        result_cache: 仿真结果缓存文件夹, 为 None 时不使用缓存。测试文件、测试数据、参数、
+                      期望输出、检查选项、被测模块源文件、头文件和仿真器都与上次通过时相同的
+                      测试文件不加入 VUnit, 不再编译和仿真, 直接打印通过。VUnit 不能注入测试结果,
+                      这些测试不出现在 VUnit 的报告和 xunit 等文件中, profile 的记录中其仿真阶段的
+                      状态为 "cached"; 所有测试都已通过时不运行 VUnit。期望输出为迭代器形式的惰性
+                      信号 (且不在仿真中检查) 的测试不使用缓存。命令行参数 --no-result-cache
+                      可以忽略缓存, 重新运行所有测试
+        result_cache_size: 缓存最多保存的结果数, 超过时删除最久未使用的结果
+        profile: 记录文件夹, 不为 None 时记录每个测试各阶段 (生成序列、生成测试数据、
+                 生成测试文件、编译、仿真、检查输出) 的耗时、读写字节数、事件数、值的个数和
+                 Python 内存峰值, 导出汇总 summary.json 和 Chrome 跟踪事件文件 trace.json
+        dry_run: 是否只估算每个测试的规模 (参见 estimate) 并打印, 不生成文件, 也不调用 VUnit
+        budgets: 估算规模时的上限, 即 estimate 的参数
+        """
+        assert group_tests or not same_sim, "same_sim 需要 group_tests"
+        msg = "parameter_generics 需要 group_tests"
+        assert group_tests or not parameter_generics, msg
+        tests = [s for t in tests for s in t.__shardTests()]
         s = set()
         for t in tests:
             msg = "模块 {} 已有测试 {}".format(t.__moduleName, t.__testName)
             assert (t.__moduleName, t.__testName) not in s, msg
             s.add((t.__moduleName, t.__testName))
-        vu = VUnit.from_argv()
+        if dry_run:
+            for t in tests:
+                e = t.estimate(**budgets)
+                print("{}.{}: 事件数 {}, 数组 {} 位, 数据文件 {} 字节, 结束时间 {}".format(
+                    t.__moduleName, t.__testName, e["events"], e["array_bits"],
+                    e["file_bytes"], e["done_ts"]))
+            return
+        cli = VUnitCLI()
+        cli.parser.add_argument("--no-result-cache",
+                                action="store_true",
+                                help="忽略仿真结果缓存, 重新运行所有测试")
+        args = cli.parse_args()
+        vu = VUnit.from_args(args)
         vu.add_verilog_builtins()
         for name, path in external_libraries.items():
             vu.add_external_library(name, path)
@@ -467,13 +1477,507 @@ endmodule
                     f.add_dependency_on(lastF)
                 lastF = f
         lib = vu.add_library("lib")
+        if group_tests:
+            groups = Test.__group(tests, parameter_generics)
+        else:
+            groups = {
+                "tb_" + t.__moduleName + "_" + t.__testName: [t]
+                for t in tests
+            }
+        for name, ts in groups.items():
+            for t in ts:
+                t.__label = "lib.{}.{}".format(name, t.__testName)
+                t.__profiler.enabled = profile is not None
+        if profile is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
         for t in tests:
             t.__path.mkdir(parents=True, exist_ok=True)
-            t.__gen()
-            t.__write()
-            t.__dump()
-            lib.add_source_file(t.__genPath(".sv"), include_dirs=include_dirs)
+            with t.__profiler.phase(t.__label, "gen") as m:
+                t.__gen()
+                m["events"] = sum([
+                    max(t.__inLens.get(c, 0), t.__outLens.get(c, 0))
+                    for c in set(t.__inLens) | set(t.__outLens)
+                ])
+                m["samples"] = sum(
+                    [len(p.input) for p in t.inPorts.values()] +
+                    [len(p.output) for p in t.outPorts.values()])
+
+        cache = None
+        sources: List[str] = []
+        if result_cache is not None and not args.no_result_cache:
+            cache = ResultCache(result_cache, result_cache_size)
+            sources = [
+                Test.__sourceDigest(dependencies, include_dirs,
+                                    external_libraries),
+                Test.__simulatorName(),
+                str(same_sim),
+                str(parameter_generics)
+            ]
+
+        # 上次已通过的测试文件
+        hits: Set[str] = set()
+
+        def cached(name: str, ts: Sequence[Test]) -> str:
+            """
+            测试文件 name 的缓存键, 不使用缓存时为空, 上次已通过时记入 hits
+            """
+            if cache is None:
+                return ""
+            digests = [t.__cacheDigest() for t in ts]
+            if None in digests:
+                return ""
+            key = ResultCache.key(sources + [name] + [str(d) for d in digests])
+            if cache.hit(key):
+                hits.add(name)
+            return key
+
+        def guard(name: str, key: str, check: Callable[[], bool]):
+            return check if cache is None or not key else cache.wrap(
+                key, name, check)
+
+        if not group_tests:
+            names = [t.__moduleName + "." + t.__testName for t in tests]
+            states = runAll(names, [t.__generate for t in tests], jobs)
+            pending = []
+            for t, state in zip(tests, states):
+                t.__restore(state)
+                name = "tb_" + t.__moduleName + "_" + t.__testName
+                key = cached(name, [t])
+                if name in hits:
+                    continue
+                pending.append((t, name, key))
+                lib.add_source_file(t.__genPath(".sv"),
+                                    include_dirs=include_dirs)
+            for t, name, key in pending:
+                lib.test_bench(name).set_post_check(guard(name, key, t.__check))
+            Test.__main(vu, tests, [
+                t for t in tests
+                if "tb_" + t.__moduleName + "_" + t.__testName in hits
+            ], profile)
+            return
+
+        # {测试文件名: 是否在同一次仿真中运行}
+        sims = {
+            name: Test.__sameSim(name, ts, same_sim, parameter_generics)
+            for name, ts in groups.items()
+        }
+        tasks = [
+            functools.partial(Test.__generateGroup, name, ts, sims[name],
+                              parameter_generics)
+            for name, ts in groups.items()
+        ]
+        keys: Dict[str, str] = {}
+        for (path, states), (name, ts) in zip(runAll(list(groups), tasks, jobs),
+                                              groups.items()):
+            for t, state in zip(ts, states):
+                t.__restore(state)
+            key = cached(name, ts)
+            if name in hits:
+                continue
+            keys[name] = key
+            lib.add_source_file(path, include_dirs=include_dirs)
+        for name, key in keys.items():
+            ts = groups[name]
+            tb = lib.test_bench(name)
+            configs = Test.__configs(ts) if parameter_generics else []
+            if not configs or not configs[0]:
+                if sims[name]:
+                    tb.set_post_check(guard(name, key, Test.__groupCheck(ts)))
+                else:
+                    for t in ts:
+                        tb.test(t.__testName).set_post_check(
+                            guard(name, key, t.__check))
+                continue
+            for i, c in enumerate(configs):
+                params: Dict[str, Union[int, str]] = dict(c)
+                params["AUTOGEN_CONFIG"] = i
+                if sims[name]:
+                    tb.add_config(name=Test.__configName(c),
+                                  parameters=params,
+                                  post_check=guard(
+                                      name, key,
+                                      Test.__groupCheck([
+                                          t for t in ts
+                                          if t.__configKey() == c
+                                      ])))
+                    continue
+                for t in ts:
+                    if t.__configKey() == c:
+                        tb.test(t.__testName).add_config(
+                            name=Test.__configName(c),
+                            parameters=params,
+                            post_check=guard(name, key, t.__check))
+        Test.__main(vu, tests,
+                    [t for name in sorted(hits) for t in groups[name]],
+                    profile)
+
+    @staticmethod
+    def __main(vu: VUnit, tests: Sequence["Test"], cached: Sequence["Test"],
+               profile: Optional[Path]) -> None:
+        """
+        运行 VUnit, profile 不为 None 时在所有测试结束后导出各阶段的记录
+
+        cached 为上次已通过的测试, 没有加入 VUnit, 在这里直接报告通过,
+        不出现在 VUnit 的报告 (及 xunit 等) 中。所有测试都已通过时不运行 VUnit
+        """
+        for t in cached:
+            print("{} 已通过 (缓存)".format(t.__label))
+        start = time.time()
+
+        def testRecords() -> List[Dict[str, Any]]:
+            records = [r for t in tests for r in t.__profiler.records]
+            # 上次已通过的测试不仿真
+            records.extend([{
+                "test": t.__label,
+                "phase": "simulate",
+                "start": start,
+                "seconds": 0.0,
+                "status": "cached"
+            } for t in cached])
+            return records
+
+        if len(cached) == len(tests):
+            if profile is not None:
+                Profiler.export(testRecords(), profile)
+            sys.exit(0)
+        if profile is None:
+            vu.main()
+            return
+
+        def postRun(results) -> None:
+            end = time.time()
+            records = testRecords()
+            checks = {r["test"]: r for r in records if r["phase"] == "check"}
+            simStarts = [end]
+            for name, res in results.get_report().tests.items():
+                # 名称为 库.测试文件[.配置].测试, 配置名可能包含 ".", 测试文件名和测试名不会。
+                # 去掉配置名, 与测试的记录对应
+                lib, bench, rest = name.split(".", 2)
+                label = "{}.{}.{}".format(lib, bench, rest.rsplit(".", 1)[-1])
+                check = checks.get(label)
+                seconds = res.time
+                simEnd = end
+                if check is not None:
+                    seconds = max(0.0, seconds - check["seconds"])
+                    simEnd = check["start"]
+                simStarts.append(simEnd - seconds)
+                records.append({
+                    "test": label,
+                    "phase": "simulate",
+                    "start": simEnd - seconds,
+                    "seconds": seconds,
+                    "status": res.status
+                })
+            # 仿真开始之前的时间为 VUnit 扫描和编译的时间, 由所有测试共享, 不属于任何一个测试
+            records.append({
+                "test": "vunit",
+                "phase": "compile",
+                "start": start,
+                "seconds": max(0.0, min(simStarts) - start),
+                "shared": True
+            })
+            Profiler.export(records, profile)
+
+        vu.main(post_run=postRun)
+
+    @staticmethod
+    def __sourceDigest(
+            dependencies: Sequence[Union[Path, Tuple[Path, Mapping[str, str]]]],
+            include_dirs: Sequence[Path],
+            external_libraries: Mapping[str, Path]) -> str:
+        """
+        被测模块源文件 (及宏定义)、头文件夹中的文件和外部库路径的 SHA-256
+        """
+        h = hashlib.sha256()
+        files: List[Path] = []
+        for d in dependencies:
+            if isinstance(d, Path):
+                files.append(d)
+            else:
+                files.append(d[0])
+                h.update(repr(sorted(d[1].items())).encode())
+        for d in include_dirs:
+            files.extend(sorted([f for f in d.iterdir() if f.is_file()]))
+        for f in files:
+            h.update(str(f).encode() + b"\0")
+            with open(f, "rb") as fd:
+                for chunk in iter(lambda: fd.read(DUMP_BUFFER_BYTES), b""):
+                    h.update(chunk)
+        for name, path in sorted(external_libraries.items()):
+            h.update("{}={}\n".format(name, path).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def __simulatorName() -> str:
+        """
+        VUnit 将使用的仿真器名称、路径和 VUnit 版本
+        """
+        simulator = SIMULATOR_FACTORY.select_simulator()
+        if simulator is None:
+            return "none " + about.version()
+        return "{} {} {}".format(simulator.name, simulator.find_prefix(),
+                                 about.version())
+
+    def __shardTests(self) -> List["Test"]:
+        """
+        按 shard 的定义生成分片测试, 未分片时返回自身
+        """
+        if self.__shards == 1:
+            return [self]
+        self.__gen()
+        prologue = self.__prologue
+        lens = {
+            clk: max(self.__inLens.get(clk, 0), self.__outLens.get(clk, 0))
+            for clk in set(self.__inLens) | set(self.__outLens)
+        }
+        for clk in lens:
+            msg = "事件时钟 {} 在 prologue 之后开始：{} > {}".format(
+                clk, self.__clocks[clk].offset, prologue)
+            assert self.__clocks[clk].offset <= prologue, msg
+        for p, cp in self.__clockPorts.items():
+            msg = "时钟端口 {} 在 prologue 之后开始：{} > {}".format(
+                p, cp.phase - cp.low, prologue)
+            assert cp.phase - cp.low <= prologue, msg
+        end = max([self.__clocks[clk][n - 1] for clk, n in lens.items()] + [0])
+        if end <= prologue:
+            return [self]
+        unit = functools.reduce(
+            lambda a, b: a * b // math.gcd(a, b),
+            [self.__clocks[clk].ts[-1] for clk in lens] +
+            [cp.period for cp in self.__clockPorts.values()], 1)
+
+        def align(ts: int) -> int:
+            return -(-ts // unit) * unit
+
+        span = end - prologue
+        bounds = sorted(
+            set([0, end] + [
+                prologue + align(span * k // self.__shards)
+                for k in range(1, self.__shards)
+            ]))
+        bounds = [ts for ts in bounds if ts <= end]
+        return [
+            self.__shardTest(i, bounds[i], bounds[i + 1],
+                             max(bounds[i] - align(self.__warmup), prologue))
+            for i in range(len(bounds) - 1)
+        ]
+
+    def __shardTest(self, i: int, begin: int, end: int, start: int) -> "Test":
+        """
+        生成第 i 个分片, 检查 (begin, end] 之内的输出, 重放 (0, prologue] 和 (start, begin] 之内的输入
+        """
+        t = Test(self.__moduleName,
+                 "{}_shard{}".format(self.__testName, i),
+                 self.__path,
+                 [(p, -port.width if port.signed else port.width)
+                  for p, port in self.inPorts.items()],
+                 [(p, -port.width if port.signed else port.width)
+                  for p, port in self.outPorts.items()],
+                 self.__parameters,
+                 report_all_errors=self.__reportAllErrors,
+                 changes_only=self.__changesOnly,
+                 dump_jobs=self.__dumpJobs,
+                 hex_data=self.__hexData,
+                 stream_output=self.__streamOutput,
+                 self_check=self.__selfCheck,
+                 timescale=self.__timescale)
+        t.__clocks = dict(self.__clocks)
+        prologue = self.__prologue if i else 0
+        if not i:
+            start = 0
+        shift = start - prologue
+        for p, cp in self.__clockPorts.items():
+            until = cp.until
+            if until is not None and until > prologue:
+                until = max(until - shift, prologue + 1)
+            t.__clockPorts[p] = ClockPort(cp.period, cp.high / cp.period,
+                                          cp.phase, until)
+
+        for p, port in self.inPorts.items():
+            if port.initValue is not None:
+                t[p] // port.initValue
+            if not port.input:
+                continue
+            clock = self.__clocks[port.clk]
+            n = len(port.input)
+            nPrologue = min(clock.count(prologue), n)
+            nStart = clock.count(start)
+            t[p] ** port.clk << port.input.window(0, nPrologue)
+            if n > nStart:
+                t[p] << port.input.window(nStart, min(clock.count(end), n))
+            elif n > nPrologue:
+                # 输入在窗口之前结束, 窗口开始时保持最后一个值
+                t[p] << port.input.window(n - 1, n)
+
+        for p, port in self.outPorts.items():
+            if not port.output:
+                continue
+            clock = self.__clocks[port.clk]
+            n = len(port.output)
+            nPrologue = clock.count(prologue)
+            nStart = clock.count(start)
+            nBegin = clock.count(begin)
+            if n <= nBegin:
+                continue
+            t.__eventShift[port.clk] = nStart - nPrologue
+            x = Value.fromStr("x", port.width, port.signed)
+            skipped = nPrologue + nBegin - nStart
+            if skipped:
+                t[p] ** port.clk >> RepeatSequence(
+                    ValueList([x], port.width, port.signed), skipped)
+            else:
+                t[p] ** port.clk
+            t[p] >> port.output.window(nBegin, min(clock.count(end), n))
+        # 数据在分片之前结束的端口不会加入分片, 只保留仍有端口依附的事件时钟
+        used = set([p.clk for p in t.inPorts.values() if p.input] +
+                   [p.clk for p in t.outPorts.values() if p.output])
+        t.__clocks = {clk: c for clk, c in t.__clocks.items() if clk in used}
+        return t
+
+    def __generate(self) -> Dict[str, Any]:
+        """
+        生成测试数据和测试文件, 返回检查输出所需的状态, 可以在子进程中执行
+        """
+        with self.__profiler.phase(self.__label, "dump") as m:
+            written = self.__manifest.bytesWritten
+            self.__dump()
+            m["bytes_written"] = self.__manifest.bytesWritten - written
+        with self.__profiler.phase(self.__label, "write") as m:
+            written = self.__manifest.bytesWritten
+            self.__write()
+            m["bytes_written"] = self.__manifest.bytesWritten - written
+        return self.__state()
+
+    @staticmethod
+    def __generateGroup(
+            name: str, tests: Sequence["Test"], sameSim: bool,
+            generics: bool) -> Tuple[Path, List[Dict[str, Any]]]:
+        """
+        生成一组测试的测试数据和测试文件 name, 返回测试文件路径和各测试检查输出所需的状态,
+        可以在子进程中执行
+        """
         for t in tests:
-            lib.test_bench("tb_" + t.__moduleName + "_" +
-                           t.__testName).set_post_check(t.__check)
-        vu.main()
+            with t.__profiler.phase(t.__label, "dump") as m:
+                written = t.__manifest.bytesWritten
+                t.__dump()
+                t.__manifest.save()
+                m["bytes_written"] = t.__manifest.bytesWritten - written
+        first = tests[0]
+        with first.__profiler.phase("lib." + name, "write") as m:
+            written = first.__manifest.bytesWritten
+            path = Test.__writeGroup(name, tests, sameSim, generics)
+            m["bytes_written"] = first.__manifest.bytesWritten - written
+        return path, [t.__state() for t in tests]
+
+    def __state(self) -> Dict[str, Any]:
+        """
+        生成数据时记录的、生成测试文件和检查输出所需的状态
+        """
+        return {
+            "inRows": self.__inRows,
+            "patched": self.__patched,
+            "zExpected": self.__zExpected,
+            "digest": self.__manifest.digest(),
+            "profile": self.__profiler.records
+        }
+
+    def __restore(self, state: Dict[str, Any]) -> None:
+        """
+        恢复子进程中记录的状态
+        """
+        self.__inRows = state["inRows"]
+        self.__patched = state["patched"]
+        self.__zExpected = state["zExpected"]
+        self.__digest = state["digest"]
+        self.__profiler.records = state["profile"]
+
+    def __cacheDigest(self) -> Optional[str]:
+        """
+        结果缓存中测试的部分: 生成的文件、参数、检查选项和期望输出的 SHA-256
+
+        在仿真中检查时期望输出已在期望值文件中。否则期望输出为迭代器形式的惰性信号时
+        无法在检查之前读取, 返回 None, 不使用缓存
+        """
+        h = hashlib.sha256()
+        h.update(self.__digest.encode())
+        h.update(
+            repr((sorted(self.__parameters.items()), self.__selfCheck,
+                  self.__reportAllErrors, self.__streamOutput,
+                  sorted(self.__eventShift.items()),
+                  sorted(self.__outLens.items()))).encode())
+        if self.__selfCheck:
+            return h.hexdigest()
+        for clk, ports in sorted(self.__outputs.items()):
+            for p in ports:
+                seq = self.outPorts[p].output
+                if not seq.randomAccess:
+                    return None
+                h.update("{} {} {} {}\n".format(clk, p, seq.width,
+                                                seq.signed).encode())
+                for row, n in seq.stringRuns():
+                    h.update("{} {}\n".format(row, n).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def __group(tests: Sequence["Test"],
+                generics: bool) -> Dict[str, List["Test"]]:
+        """
+        按模块、参数 (generics 为真时为参数名) 和时间单位将测试分组,
+        返回 {测试文件名: [测试]}
+
+        模块只有一组测试时测试文件名为 tb_<模块名>, 否则为 tb_<模块名>_<组序号>
+        """
+        keys: Dict[Tuple[str, Tuple, str], List["Test"]] = {}
+        for t in tests:
+            params: Tuple = t.__configKey()
+            if generics:
+                params = tuple([k for k, _ in params])
+            key = (t.__moduleName, params, t.__timescale)
+            if key not in keys:
+                keys[key] = []
+            keys[key].append(t)
+        counts: Dict[str, int] = {}
+        for module, _, _ in keys:
+            counts[module] = counts.get(module, 0) + 1
+        res: Dict[str, List["Test"]] = {}
+        indices: Dict[str, int] = {}
+        for (module, _, _), ts in keys.items():
+            if counts[module] == 1:
+                res["tb_" + module] = ts
+            else:
+                indices[module] = indices.get(module, 0) + 1
+                res["tb_{}_{}".format(module, indices[module])] = ts
+        return res
+
+    @staticmethod
+    def __sameSim(name: str, tests: Sequence["Test"], sameSim: bool,
+                  generics: bool) -> bool:
+        """
+        测试文件 name 中的测试是否在同一次仿真中运行
+
+        VUnit 不允许为在同一次仿真中运行的测试单独设置配置, 只能为整个测试文件设置,
+        每个配置都会运行所有测试。参数组合不止一种时, 各测试改为单独仿真, 只运行其参数组合
+        对应的配置, 避免其他参数组合的测试被报告为通过
+        """
+        if not sameSim:
+            return False
+        if generics and len(Test.__configs(tests)) > 1:
+            print("警告：测试文件 {} 有多种参数组合，各测试单独仿真".format(name))
+            return False
+        return True
+
+    @staticmethod
+    def __groupCheck(tests: Sequence["Test"]):
+        """
+        同一次仿真中运行的测试的检查函数, 依次检查每个测试
+        """
+
+        # 此函数不能有类型，否则 VUnit 不工作
+        def check():
+            res = True
+            for t in tests:
+                print("{}:".format(t.__testName))
+                res = t.__check() and res
+            return res
+
+        return check
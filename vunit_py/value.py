@@ -1,6 +1,9 @@
 import typing
-from typing import Iterator, List, Sequence, Union
+from typing import (Hashable, Iterator, List, NamedTuple, Optional,
+                    Sequence, Tuple, Union)
+from collections import OrderedDict
 from enum import Enum
+import threading
 
 
 class Logic(Enum):
@@ -42,12 +45,85 @@ class Logic(Enum):
         assert False, "值包含非法字符：{}".format(c)
 
 
+# 翻译表: 字符串到各位平面
+_BITS_TABLE = str.maketrans("01xXzZ", "010000")
+_XZ_TABLE = str.maketrans("01xXzZ", "001111")
+_Z_TABLE = str.maketrans("01xXzZ", "000011")
+_CHECK_TABLE = str.maketrans("", "", "01xXzZ")
+# 翻译表: 每位一个十六进制数位 (0/1/2/3) 到字符串
+_STR_TABLE = str.maketrans("23", "xz")
+_LOGICS = (Logic.LO, Logic.HI, Logic.X, Logic.Z)
+# 驻留的值的最大宽度。更宽的值很少重复, 键 (及缓存的字符串) 却很大, 不驻留
+INTERN_MAX_WIDTH = 64
+
+
+class CacheInfo(NamedTuple):
+    """
+    驻留池统计
+    """
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
+
+class _InternPool(object):
+    """
+    值的驻留池, 以 (内容, 宽度, 符号) 为键, 相同的输入共享同一个 (不可变的) 值
+
+    池满时淘汰最早加入的值。淘汰和加入在锁内进行, 可以在多个线程中同时使用;
+    查找不加锁 (字典的查找本身是原子的), 多个线程同时查找时命中/未命中的统计可能偏少。
+    进程池中的子进程各有一份驻留池, 互不影响
+    """
+    maxsize: int
+    hits: int
+    misses: int
+    values: "OrderedDict[Tuple[Hashable, int, bool], Value]"
+    lock: threading.Lock
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Tuple[Hashable, int, bool]) -> Optional["Value"]:
+        v = self.values.get(key)
+        if v is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return v
+
+    def put(self, key: Tuple[Hashable, int, bool], v: "Value") -> "Value":
+        if self.maxsize <= 0:
+            return v
+        with self.lock:
+            if len(self.values) >= self.maxsize:
+                # dict 反复删除第一项时 next(iter(...)) 需要跳过已删除的项, 为平方复杂度
+                self.values.popitem(last=False)
+            self.values[key] = v
+        return v
+
+
+_POOL = _InternPool(1 << 16)
+
+
 class Value(object):
     """
     值, 包含多位逻辑值
+
+    内部以位平面表示: 值平面 (为 1 的位), x/z 平面 (为 x 或 z 的位) 和 z 平面 (为 z 的位),
+    第 0 位对应整数的最高位。x/z 位在值平面中为 0
     """
-    __value: List[Logic]
+    __width: int
     __signed: bool
+    __bits: int
+    __xz: int
+    __z: int
+    # 二进制字符串的缓存, 值不可变, 驻留的值只需转换一次
+    __text: Optional[str] = None
 
     def __init__(self, value: Sequence[Logic], signed: bool):
         """
@@ -56,28 +132,49 @@ class Value(object):
         """
         assert value, "值为空"
         assert not signed or len(value) >= 2, "有符号值少于 2 位"
-        self.__value = list(value)
+        self.__setPlanes("".join([str(v) for v in value]), signed)
+
+    def __setPlanes(self, s: str, signed: bool) -> None:
+        self.__width = len(s)
         self.__signed = signed
+        self.__bits, self.__xz, self.__z = Value.planesFromStr(s)
 
     def __str__(self) -> str:
-        return "".join([str(v) for v in self.__value])
+        if self.__text is not None:
+            return self.__text
+        if not self.__xz:
+            self.__text = format(self.__bits, "0{}b".format(self.__width))
+            return self.__text
+        # 将三个位平面展开为十六进制数位后相加, 每位得到 0/1/2/3, 不会进位
+        digits = (int(format(self.__bits, "b"), 16) +
+                  2 * int(format(self.__xz, "b"), 16) +
+                  int(format(self.__z, "b"), 16))
+        self.__text = format(digits, "0{}x".format(
+            self.__width)).translate(_STR_TABLE)
+        return self.__text
 
     def __repr__(self) -> str:
         return str(self)
 
     def __int__(self) -> int:
-        assert all([v == Logic.LO or v == Logic.HI
-                    for v in self.__value]), "包含 x 或 z 的值无法转换为整数"
-        res = 0
-        for v in self.__value:
-            res <<= 1
-            res |= 1 if v == Logic.HI else 0
-        if self.__signed and self.__value[0] == Logic.HI:
-            return res - (1 << len(self.__value))
-        return res
+        assert not self.__xz, "包含 x 或 z 的值无法转换为整数"
+        if self.__signed and self.__bits >> (self.__width - 1):
+            return self.__bits - (1 << self.__width)
+        return self.__bits
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Value):
+            return NotImplemented
+        return (self.__width == other.__width
+                and self.__signed == other.__signed
+                and self.__bits == other.__bits and self.__xz == other.__xz
+                and self.__z == other.__z)
+
+    def __hash__(self) -> int:
+        return hash((self.__width, self.__signed, self.__bits, self.__xz))
 
     def __iter__(self) -> Iterator[Logic]:
-        return iter(self.__value)
+        return iter(self.value)
 
     @typing.overload
     def __getitem__(self, i: int) -> Logic:
@@ -90,22 +187,38 @@ class Value(object):
     def __getitem__(self, i: Union[int, slice]):
         assert not self.__signed, "有符号值无法分割"
         if isinstance(i, slice):
-            return Value(self.__value[i], False)
-        return self.__value[i]
+            start, stop, step = i.indices(self.__width)
+            if step != 1:
+                return Value(self.value[i], False)
+            assert start < stop, "值为空"
+            shift = self.__width - stop
+            mask = (1 << (stop - start)) - 1
+            return Value.fromPlanes((self.__bits >> shift) & mask,
+                                    (self.__xz >> shift) & mask,
+                                    (self.__z >> shift) & mask,
+                                    stop - start, False)
+        if i < 0:
+            i += self.__width
+        if not 0 <= i < self.__width:
+            raise IndexError("下标越界：{}".format(i))
+        shift = self.__width - 1 - i
+        return _LOGICS[((self.__bits >> shift) & 1) +
+                       ((self.__xz >> shift) & 1) * 2 +
+                       ((self.__z >> shift) & 1)]
 
     @property
     def value(self) -> List[Logic]:
         """
         以列表形式表示的值
         """
-        return self.__value
+        return [Logic.fromChar(c) for c in str(self)]
 
     @property
     def width(self) -> int:
         """
         值宽度
         """
-        return len(self.__value)
+        return self.__width
 
     @property
     def signed(self) -> bool:
@@ -114,6 +227,27 @@ class Value(object):
         """
         return self.__signed
 
+    @property
+    def valuePlane(self) -> int:
+        """
+        值平面, 为 1 的位置 1
+        """
+        return self.__bits
+
+    @property
+    def xzPlane(self) -> int:
+        """
+        x/z 平面, 为 x 或 z 的位置 1
+        """
+        return self.__xz
+
+    @property
+    def zPlane(self) -> int:
+        """
+        z 平面, 为 z 的位置 1
+        """
+        return self.__z
+
     def slice(self, width: int, signed: bool) -> List["Value"]:
         """
         width: 宽度
@@ -125,11 +259,53 @@ class Value(object):
         assert width > 0, "分割宽度不是正整数"
         assert self.width % width == 0, "宽度不是倍数，无法分割：{} | {}".format(
             self.width, width)
+        n = self.width // width
+        assert not signed or width >= 2, "有符号值少于 2 位"
+
+        def split(plane: int) -> List[int]:
+            if not plane:
+                return [0] * n
+            s = format(plane, "0{}b".format(self.width))
+            return [int(s[i:i + width], 2) for i in range(0, self.width, width)]
+
         return [
-            Value(self.__value[i * width:(i + 1) * width], signed)
-            for i in range(self.width // width)
+            Value.fromPlanes(b, xz, z, width, signed) for b, xz, z in zip(
+                split(self.__bits), split(self.__xz), split(self.__z))
         ]
 
+    @staticmethod
+    def fromPlanes(bits: int, xz: int, z: int, width: int,
+                   signed: bool) -> "Value":
+        """
+        bits: 值平面
+        xz: x/z 平面
+        z: z 平面
+        width: 宽度
+        signed: 值是否有符号
+
+        从位平面生成值, x/z 位在值平面中的位会被清零
+        """
+        assert width > 0, "宽度不是正整数"
+        assert not signed or width >= 2, "有符号值少于 2 位"
+        v = Value.__new__(Value)
+        v.__width = width
+        v.__signed = signed
+        v.__xz = xz
+        v.__bits = bits & ~xz if xz else bits
+        v.__z = z & xz
+        return v
+
+    @staticmethod
+    def planesFromStr(s: str) -> Tuple[int, int, int]:
+        """
+        s: 只包含 01xXzZ 的字符串, 不检查字符是否合法
+
+        将字符串转换为 (值平面, x/z 平面, z 平面), 第 0 个字符对应最高位
+        """
+        xz = int(s.translate(_XZ_TABLE), 2)
+        return (int(s.translate(_BITS_TABLE), 2), xz,
+                int(s.translate(_Z_TABLE), 2) if xz else 0)
+
     @staticmethod
     def fromBools(bs: Sequence[bool], width: int) -> "Value":
         """
@@ -140,7 +316,8 @@ class Value(object):
         """
         assert width > 0, "宽度不是正整数"
         assert len(bs) == width, "值的宽度不匹配：{} != {}".format(len(bs), width)
-        return Value([Logic.HI if b else Logic.LO for b in bs], False)
+        return Value.fromPlanes(int("".join(["1" if b else "0" for b in bs]), 2),
+                                0, 0, width, False)
 
     @staticmethod
     def fromInt(v: int, width: int, signed: bool) -> "Value":
@@ -149,8 +326,16 @@ class Value(object):
         width: 宽度
         signed: 值是否有符号
 
-        从整数生成值
+        从整数生成值, 宽度不超过 INTERN_MAX_WIDTH 时相同的输入返回同一个值
         """
+        # NumPy 等的整数标量与 int 相等且哈希相同, 需要先转换, 否则会以其类型存入驻留池
+        v = int(v)
+        key = (v, width, signed)
+        intern = width <= INTERN_MAX_WIDTH
+        if intern:
+            cached = _POOL.get(key)
+            if cached is not None:
+                return cached
         assert width > 0, "宽度不是正整数"
         if signed:
             assert width > 1, "有符号值宽度小于 2"
@@ -161,10 +346,8 @@ class Value(object):
         else:
             assert v >= 0, "不支持负数值"
             assert v < (1 << width), "值宽度太大：{} >= 2^{}".format(v, width)
-        return Value([
-            Logic.HI if (v >> (width - 1 - i)) & 1 else Logic.LO
-            for i in range(width)
-        ], signed)
+        res = Value.fromPlanes(v, 0, 0, width, signed)
+        return _POOL.put(key, res) if intern else res
 
     @staticmethod
     def fromStr(s: str, width: int, signed: bool) -> "Value":
@@ -173,15 +356,32 @@ class Value(object):
         width: 宽度
         signed: 值是否有符号
 
-        从字符串生成值, "x" 表示所有位都是 x, "z" 表示所有位都是 z
+        从字符串生成值, "x" 表示所有位都是 x, "z" 表示所有位都是 z。宽度不超过
+        INTERN_MAX_WIDTH (或为 "x"/"z") 时相同的输入返回同一个值
         """
+        key = (s, width, signed)
+        if width > INTERN_MAX_WIDTH and len(s) > 1:
+            return Value.__fromStr(s, width, signed)
+        cached = _POOL.get(key)
+        if cached is not None:
+            return cached
+        return _POOL.put(key, Value.__fromStr(s, width, signed))
+
+    @staticmethod
+    def __fromStr(s: str, width: int, signed: bool) -> "Value":
         assert width > 0, "宽度不是正整数"
         if s.lower() == "x":
-            return Value([Logic.X] * width, signed)
+            return Value.fromPlanes(0, (1 << width) - 1, 0, width, signed)
         if s.lower() == "z":
-            return Value([Logic.Z] * width, signed)
+            mask = (1 << width) - 1
+            return Value.fromPlanes(0, mask, mask, width, signed)
         assert len(s) == width, "值的宽度不匹配：{} != {}".format(len(s), width)
-        return Value([Logic.fromChar(c) for c in s], signed)
+        bad = s.translate(_CHECK_TABLE)
+        assert not bad, "值包含非法字符：{}".format(bad[0] if bad else "")
+        assert not signed or width >= 2, "有符号值少于 2 位"
+        v = Value.__new__(Value)
+        v.__setPlanes(s, signed)
+        return v
 
     @staticmethod
     def fromBytes(s: bytes, width: int, signed: bool) -> "Value":
@@ -195,8 +395,7 @@ class Value(object):
         assert width > 0, "宽度不是正整数"
         assert len(s) * 8 == width, "值的宽度不匹配：{} != {}".format(
             len(s) * 8, width)
-        return Value([v for c in s for v in Value.fromInt(c, 8, False)],
-                     signed)
+        return Value.fromPlanes(int.from_bytes(s, "big"), 0, 0, width, signed)
 
     @staticmethod
     def fromAny(v: "ValueDef", width: int, signed: bool) -> "Value":
@@ -222,5 +421,23 @@ class Value(object):
             return Value.fromInt(v, width, signed)
         return Value.fromBools(v, width)
 
+    @staticmethod
+    def cacheInfo() -> CacheInfo:
+        """
+        fromInt/fromStr (以及经由它们的 fromAny) 所用驻留池的命中/未命中统计
+        """
+        return CacheInfo(_POOL.hits, _POOL.misses, len(_POOL.values),
+                         _POOL.maxsize)
+
+    @staticmethod
+    def clearCache(maxsize: Optional[int] = None) -> None:
+        """
+        maxsize: 新的驻留池容量, 为 0 时不驻留
+
+        清空驻留池及统计
+        """
+        global _POOL
+        _POOL = _InternPool(_POOL.maxsize if maxsize is None else maxsize)
+
 
 ValueDef = Union[Value, int, str, bytes, Sequence[bool]]
@@ -0,0 +1,247 @@
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .value import Value
+from .sequence import ValueSequence
+
+WORD_BITS = 64
+# 每次展开的位数上限, 用于限制 strings() 的内存占用
+_BLOCK_BITS = 1 << 22
+_CHARS = np.frombuffer(b"01xz", dtype=np.uint8)
+
+
+def _words(width: int) -> int:
+    return (width + WORD_BITS - 1) // WORD_BITS
+
+
+def _unpack(words: np.ndarray) -> np.ndarray:
+    """
+    将 (T, n) 的 uint64 数组展开为 (T, n * 64) 的 0/1 数组, 最高位在前
+    """
+    bytes_ = np.ascontiguousarray(words, dtype=">u8").view(np.uint8)
+    return np.unpackbits(bytes_, axis=1)
+
+
+def _rowInt(row: np.ndarray) -> int:
+    return int.from_bytes(np.ascontiguousarray(row, dtype=">u8").tobytes(),
+                          "big")
+
+
+class ValueArray(ValueSequence):
+    """
+    以 NumPy 位平面数组存储的值序列
+
+    每个位平面是形如 (T, ceil(width / 64)) 的 uint64 数组, 每行第 0 个字为最高位,
+    值靠右对齐。x/z 平面和 z 平面为 None 时表示没有对应的位
+    """
+    __bits: np.ndarray
+    __xz: Optional[np.ndarray]
+    __z: Optional[np.ndarray]
+
+    def __init__(self, bits: np.ndarray, xz: Optional[np.ndarray],
+                 z: Optional[np.ndarray], width: int, signed: bool):
+        """
+        bits: 值平面
+        xz: x/z 平面, 为 None 时所有位均为 0/1
+        z: z 平面, 为 None 时没有 z
+        width: 值宽度
+        signed: 值是否有符号
+        """
+        super().__init__(width, signed)
+        assert not signed or width >= 2, "有符号值少于 2 位"
+        shape = (bits.shape[0], _words(width))
+        msg = "位平面形状不匹配：{} != {}".format(bits.shape, shape)
+        assert bits.shape == shape, msg
+        assert xz is None or xz.shape == shape, msg
+        assert z is None or z.shape == shape, msg
+        assert z is None or xz is not None, "z 平面需要 x/z 平面"
+        self.__bits = bits
+        self.__xz = xz
+        self.__z = z
+
+    @property
+    def valuePlanes(self) -> np.ndarray:
+        """
+        值平面
+        """
+        return self.__bits
+
+    @property
+    def xzPlanes(self) -> Optional[np.ndarray]:
+        """
+        x/z 平面
+        """
+        return self.__xz
+
+    @property
+    def zPlanes(self) -> Optional[np.ndarray]:
+        """
+        z 平面
+        """
+        return self.__z
+
+    def __len__(self) -> int:
+        return self.__bits.shape[0]
+
+    def at(self, t: int) -> Value:
+        return Value.fromPlanes(
+            _rowInt(self.__bits[t]),
+            _rowInt(self.__xz[t]) if self.__xz is not None else 0,
+            _rowInt(self.__z[t]) if self.__z is not None else 0, self.width,
+            self.signed)
+
+    def window(self, start: int, stop: int) -> "ValueArray":
+        return ValueArray(
+            self.__bits[start:stop],
+            self.__xz[start:stop] if self.__xz is not None else None,
+            self.__z[start:stop] if self.__z is not None else None,
+            self.width, self.signed)
+
+    def strings(self) -> Iterator[str]:
+        w = self.width
+        pad = self.__bits.shape[1] * WORD_BITS - w
+        block = max(1, _BLOCK_BITS // (self.__bits.shape[1] * WORD_BITS))
+        for s in range(0, len(self), block):
+            codes = _unpack(self.__bits[s:s + block])
+            if self.__xz is not None:
+                codes += _unpack(self.__xz[s:s + block]) << 1
+            if self.__z is not None:
+                codes += _unpack(self.__z[s:s + block])
+            text = _CHARS[codes[:, pad:]].tobytes().decode("ascii")
+            for i in range(0, len(text), w):
+                yield text[i:i + w]
+
+    def ints(self) -> np.ndarray:
+        """
+        转换为整数数组, 不能包含 x 或 z
+
+        宽度不超过 64 位时返回 int64 数组 (64 位无符号值返回 uint64 数组),
+        否则返回元素为 python 整数的 object 数组
+        """
+        assert self.__xz is None or not self.__xz.any(), "包含 x 或 z 的值无法转换为整数"
+        if self.width > WORD_BITS:
+            return np.array([int(v) for v in self], dtype=object)
+        v = self.__bits[:, 0]
+        if self.width == WORD_BITS and not self.signed:
+            return v.copy()
+        v = v.astype(np.int64)
+        if self.signed:
+            sign = np.int64(1) << np.int64(self.width - 1)
+            v = (v ^ sign) - sign
+        return v
+
+    @staticmethod
+    def concat(arrays: Sequence["ValueArray"]) -> "ValueArray":
+        """
+        拼接多个宽度和符号一致的值序列
+        """
+        assert arrays, "值序列为空"
+        width = arrays[0].width
+        signed = arrays[0].signed
+        assert all([a.width == width and a.signed == signed
+                    for a in arrays]), "值序列的宽度或符号不一致"
+
+        def planes(ps: List[Optional[np.ndarray]]) -> Optional[np.ndarray]:
+            if all([p is None for p in ps]):
+                return None
+            return np.concatenate([
+                p if p is not None else np.zeros(a.__bits.shape, np.uint64)
+                for a, p in zip(arrays, ps)
+            ])
+
+        return ValueArray(np.concatenate([a.__bits for a in arrays]),
+                          planes([a.__xz for a in arrays]),
+                          planes([a.__z for a in arrays]), width, signed)
+
+    @staticmethod
+    def fromValues(values: Iterable[Value], width: int,
+                   signed: bool) -> "ValueArray":
+        """
+        values: 值序列, 宽度和符号需要与 width 和 signed 一致
+        width: 值宽度
+        signed: 值是否有符号
+
+        从值序列生成
+        """
+        bits = []
+        xz = []
+        z = []
+        for v in values:
+            bits.append(v.valuePlane)
+            xz.append(v.xzPlane)
+            z.append(v.zPlane)
+        return ValueArray(ValueArray.__pack(bits, width),
+                          ValueArray.__pack(xz, width) if any(xz) else None,
+                          ValueArray.__pack(z, width) if any(z) else None,
+                          width, signed)
+
+    @staticmethod
+    def fromSequence(values: ValueSequence) -> "ValueArray":
+        """
+        从任意值序列生成
+        """
+        if isinstance(values, ValueArray):
+            return values
+        return ValueArray.fromValues(values, values.width, values.signed)
+
+    @staticmethod
+    def fromArray(a: np.ndarray, width: int, signed: bool) -> "ValueArray":
+        """
+        a: NumPy 数组
+        width: 值宽度
+        signed: 值是否有符号
+
+        从 NumPy 数组生成:
+          一维整数或布尔数组, 每个元素为一个值
+          二维 uint64 数组, 形如 (T, ceil(width / 64)), 每行为一个值的位平面
+          其他一维数组, 每个元素按 Value.fromAny 转换
+        """
+        if a.ndim == 2:
+            msg = "二维数组需要为 uint64 类型：{}".format(a.dtype)
+            assert a.dtype == np.uint64, msg
+            bits = np.array(a, dtype=np.uint64)
+            top = width - (_words(width) - 1) * WORD_BITS
+            if bits.shape[1] == _words(width) and top < WORD_BITS:
+                msg = "值宽度太大：超过 {} 位".format(width)
+                assert not (bits[:, 0] >> np.uint64(top)).any(), msg
+            return ValueArray(bits, None, None, width, signed)
+        assert a.ndim == 1, "不支持的数组维数：{}".format(a.ndim)
+        if a.dtype == np.bool_:
+            a = a.astype(np.uint8)
+        if a.dtype.kind in "iu" and width <= WORD_BITS:
+            if signed:
+                assert width > 1, "有符号值宽度小于 2"
+                lim = 1 << (width - 1)
+                if a.size:
+                    lo = int(a.min())
+                    hi = int(a.max())
+                    msg = "有符号值宽度太大：{} < 2^{}".format(lo, width - 1)
+                    assert lo >= -lim, msg
+                    msg = "有符号值宽度太大：{} >= 2^{}".format(hi, width - 1)
+                    assert hi < lim, msg
+                bits = a.astype(np.int64).astype(np.uint64)
+                if width < WORD_BITS:
+                    bits &= np.uint64((1 << width) - 1)
+            else:
+                if a.size:
+                    assert int(a.min()) >= 0, "不支持负数值"
+                    msg = "值宽度太大：{} >= 2^{}".format(int(a.max()), width)
+                    assert int(a.max()) < (1 << width), msg
+                bits = a.astype(np.uint64)
+            return ValueArray(bits.reshape(-1, 1), None, None, width, signed)
+        # tolist 将 NumPy 标量转换为 int/str 等 Python 类型
+        return ValueArray.fromValues(
+            [Value.fromAny(v, width, signed) for v in a.tolist()], width, signed)
+
+    @staticmethod
+    def __pack(planes: List[int], width: int) -> np.ndarray:
+        n = _words(width)
+        if n == 1:
+            return np.array(planes, dtype=np.uint64).reshape(-1, 1)
+        mask = (1 << WORD_BITS) - 1
+        res = np.empty((len(planes), n), dtype=np.uint64)
+        for i in range(n):
+            shift = (n - 1 - i) * WORD_BITS
+            res[:, i] = [(p >> shift) & mask for p in planes]
+        return res